@@ -45,11 +45,14 @@ TODO
 
 """
 
-import bpy, blf
-import os, sys, numpy
+import bpy, blf, gpu
+import os, re, sys, json, time, heapq, fnmatch, itertools, numpy
+from collections import deque
+from bisect import bisect_left
 from datetime import datetime
 from math import hypot
 from mathutils import Vector
+from gpu_extras.batch import batch_for_shader
 
 
 #add bl_ui to modules, we'll need to borrow a class later
@@ -92,21 +95,91 @@ def get_active_tree(context):
     return tree, path
 
 
-def get_space_from_mouse(x,y):
-    
-    areas =  bpy.context.window.screen.areas
-    for a in areas:
-        if (a.x<x<a.x+a.width) and (a.y<y<a.y+a.height):
-            return a.spaces[0]
-    return None 
+def get_node_select(nodes):
+    """selection state of all nodes as a bool array, read in bulk"""
+
+    select = numpy.empty(len(nodes), dtype=bool)
+    nodes.foreach_get("select", select)
+
+    return select
 
 
 def set_all_node_select(nodes, select_state,):
-    for n in nodes:
-        n.select = select_state
+
+    if (get_node_select(nodes)==select_state).all():
+        return None 
+
+    nodes.foreach_set("select", numpy.full(len(nodes), select_state, dtype=bool))
+
     return None 
 
 
+class SelectionTransaction():
+    """accumulate the wanted selection state of a nodetree, then commit it in one bulk foreach_set (skipped if nothing changed)"""
+
+    def __init__(self, nodes, clear=False):
+
+        self.nodes = nodes
+        self.current = get_node_select(nodes)
+        self.wanted = numpy.zeros(len(nodes), dtype=bool) if clear else self.current.copy()
+        self.index = None #node name -> node index
+
+    def get_index(self, node):
+
+        if (self.index is None):
+            self.index = {n.name:i for i,n in enumerate(self.nodes)}
+
+        return self.index[node.name]
+
+    def select(self, node, state=True):
+        self.wanted[self.get_index(node)] = state
+        return None
+
+    def select_all(self, state=True):
+        self.wanted[:] = state
+        return None
+
+    def commit(self):
+        """write wanted state, return True if anything changed"""
+
+        if (self.wanted==self.current).all():
+            return False
+
+        self.nodes.foreach_set("select", self.wanted)
+        self.current = self.wanted.copy()
+
+        return True
+
+
+def tag_area_redraw(area):
+    """bulk foreach_set writes send no notifier, the editor must be redrawn by hand"""
+
+    if (area is not None):
+        area.tag_redraw()
+
+    return None
+
+
+def save_node_select(nodes):
+    """store selection state of a nodetree as a compact bitset"""
+
+    return len(nodes), numpy.packbits(get_node_select(nodes)).tobytes()
+
+
+def restore_node_select(nodes, saved):
+    """restore a bitset created with save_node_select, only if nodes count did not change"""
+
+    count, bits = saved
+    if (count!=len(nodes)):
+        return False
+
+    select = numpy.unpackbits(numpy.frombuffer(bits, dtype=numpy.uint8), count=count).astype(bool)
+    if (get_node_select(nodes)!=select).any():
+        nodes.foreach_set("select", select)
+
+    return True
+
+
 def popup_menu(msgs,title,icon):
 
     def draw(self, context):
@@ -126,6 +199,9 @@ def ensure_mouse_cursor(context, event,):
     v2d = context.region.view2d
     tree = space.edit_tree
 
+    #the editor the user is working in, target of palette clicks
+    set_palette_area(context.area)
+
     # convert mouse position to the View2D for later node placement
     if (context.region.type == "WINDOW"):
           space.cursor_location_from_region(event.mouse_region_x, event.mouse_region_y)
@@ -135,103 +211,267 @@ def ensure_mouse_cursor(context, event,):
 
 
 def get_node_location(node, nodes,):
-    """find real location of a node (global space guaranteed)"""
+    """find real location of a node (global space guaranteed), using the memoized frame offsets"""
     
     if (node.parent is None):
         return node.location
 
+    offsets = get_frame_offsets(nodes)
+    if (node.parent.name not in offsets):
+        offsets = get_frame_offsets(nodes, refresh=True)
+
     x,y = node.location
+    ox,oy = offsets[node.parent.name]
 
-    while (node.parent is not None):
-        x += node.parent.location.x
-        y += node.parent.location.y
-        node = node.parent
-        continue
+    return Vector((x+ox,y+oy))
 
-    return Vector((x,y))
 
+class PreviewModel():
+    """pure python shadow of what a modal operator is editing, drawn by the overlay.
+    in deferred preview mode, modal ticks only edit this model, the nodetree is written once on confirm"""
 
-AllFonts = {} 
+    def __init__(self):
 
-def blf_add_font(text="Hello World", size=[50,72], position=[2,180], color=[1,1,1,0.1], origin="BOTTOM LEFT", shadow={"blur":3,"color":[0,0,0,0.6],"offset":[2,-2],}):
-    """draw fond handler"""
+        self.rects = [] #(xmin, ymin, xmax, ymax) in global node space
+        self.lines = [] #polylines, list of (x,y) in global node space
+        self.points = [] #(x,y) in global node space, reroute previews
+        self.color = (0.9, 0.9, 0.9, 0.9)
 
-    global AllFonts
+    def show(self):
+        NoodlerOverlay.add_preview(self)
+        return None
 
-    Id = str(len(AllFonts.keys())+1)
-    AllFonts[Id]= {"font_id":0, "handler":None,}
+    def hide(self):
+        NoodlerOverlay.remove_preview(self)
+        return None
 
-    def draw(self, context):
-            
-        font_id = AllFonts[Id]["font_id"]
-    
-        #Define X
-        if "LEFT" in origin:
-            pos_x = position[0]
-        elif "RIGHT" in origin:
-            pos_x = bpy.context.region.width - position[0]
-        #Define Y
-        if "BOTTOM" in origin:
-            pos_y = position[1]
-        elif "TOP" in origin:
-            pos_y = bpy.context.region.height - position[1]
 
+def is_deferred_preview():
 
-        blf.position(font_id, pos_x, pos_y, 0)
+    addon = bpy.context.preferences.addons.get(__name__)
 
-        blf.color(font_id, color[0], color[1], color[2], color[3])
+    return (addon is not None) and addon.preferences.deferred_preview
 
-        blf.size(font_id, size[0], size[1])
 
-        if shadow is not None:
-            blf.enable(font_id, blf.SHADOW)
-            blf.shadow(font_id, shadow["blur"], shadow["color"][0], shadow["color"][1], shadow["color"][2], shadow["color"][3])
-            blf.shadow_offset(font_id, shadow["offset"][0], shadow["offset"][1])
+class Overlay():
+    """one SpaceNodeEditor draw handler for all texts & previews, items are retained with their layout precomputed.
+    ids are never reused, items can expire"""
 
-        blf.draw(font_id, text)
+    def __init__(self):
 
-        return None 
+        self.items = {} #Id -> item
+        self.groups = {} #style key -> list of Id, so blf state is set once per style
+        self.previews = [] #PreviewModel shown
+        self.ids = itertools.count(1)
+        self.handler = None
+        self.font_id = 0
 
-    # #try to Load custom font?
-    # import os
-    # font_path = bpy.path.abspath('//Zeyada.ttf')
-    # if os.path.exists(font_path):
-    #       AllFonts["font_id"] = blf.load(font_path)
-    # else: AllFonts["font_id"] = 0
+    def ensure_handler(self):
 
-    #add font handler 
-    draw_handler = bpy.types.SpaceNodeEditor.draw_handler_add( draw, (None, None), 'WINDOW', 'POST_PIXEL')
-    AllFonts[Id]["handler"] = draw_handler
+        if (self.handler is None):
+            self.handler = bpy.types.SpaceNodeEditor.draw_handler_add(self.draw, (), 'WINDOW', 'POST_PIXEL')
 
-    return Id
+        return None
 
+    def release_handler(self):
+        """nothing to draw? no need to keep a handler"""
 
-def blf_clear_all_fonts(Id=None):
-    """clear all fond appended"""
+        if (not self.items) and (not self.previews) and (self.handler is not None):
+            bpy.types.SpaceNodeEditor.draw_handler_remove(self.handler, "WINDOW")
+            self.handler = None
+
+        return None
 
-    global AllFonts
+    def add_preview(self, preview):
 
-    if (Id is not None): 
-        if Id in AllFonts:
-            bpy.types.SpaceNodeEditor.draw_handler_remove(AllFonts[Id]["handler"], "WINDOW")
-            del AllFonts[Id]
-        return None 
+        if (preview not in self.previews):
+            self.previews.append(preview)
+        self.ensure_handler()
+
+        return None
+
+    def remove_preview(self, preview):
+
+        if (preview in self.previews):
+            self.previews.remove(preview)
+        self.release_handler()
+
+        return None
+
+    def add(self, text, size, position, color, origin, shadow, duration=None):
+
+        Id = str(next(self.ids))
+
+        style = (
+            tuple(size),
+            tuple(color),
+            None if (shadow is None) else (shadow["blur"], tuple(shadow["color"]), tuple(shadow["offset"])),
+            )
+        self.items[Id] = {
+            "text":text,
+            "position":tuple(position),
+            "from_right":("RIGHT" in origin),
+            "from_top":("TOP" in origin),
+            "style":style,
+            "expire":None if (duration is None) else (time.monotonic()+duration),
+            }
+        self.groups.setdefault(style,[]).append(Id)
+
+        self.ensure_handler()
+
+        #one timer for all expiring items, fired at the nearest expiration
+        if (duration is not None):
+            if bpy.app.timers.is_registered(overlay_expire):
+                bpy.app.timers.unregister(overlay_expire)
+            bpy.app.timers.register(overlay_expire, first_interval=self.expire() or duration)
+
+        return Id
+
+    def remove(self, Id=None):
+        """remove given item, or all items if None"""
+
+        if (Id is None):
+              self.items.clear()
+              self.groups.clear()
+        elif (Id in self.items):
+            item = self.items.pop(Id)
+            group = self.groups[item["style"]]
+            group.remove(Id)
+            if not group:
+                del self.groups[item["style"]]
+
+        self.release_handler()
+
+        return None
+
+    def expire(self):
+        """remove expired items, return time until next expiration"""
+
+        now = time.monotonic()
+        expires = [(Id,item["expire"]) for Id,item in self.items.items() if (item["expire"] is not None)]
+
+        for Id,_ in [e for e in expires if (e[1]<=now)]:
+            self.remove(Id)
+
+        remaining = [t for _,t in expires if (t>now)]
+
+        return (min(remaining)-now) if remaining else None
+
+    def draw_previews(self, region):
+        """draw all preview shapes in one batch per primitive"""
+
+        view2d = region.view2d
+        dpifac = get_dpifac()
+
+        def to_region(x, y):
+            return view2d.view_to_region(x*dpifac, y*dpifac, clip=False)
+
+        shader = gpu.shader.from_builtin('2D_UNIFORM_COLOR')
+
+        for preview in self.previews:
+
+            segments = []
+            for xmin, ymin, xmax, ymax in preview.rects:
+                corners = [to_region(xmin,ymin), to_region(xmax,ymin), to_region(xmax,ymax), to_region(xmin,ymax)]
+                for k in range(4):
+                    segments += [corners[k], corners[(k+1)%4]]
+                continue
+            for line in preview.lines:
+                points = [to_region(x,y) for x,y in line]
+                for k in range(len(points)-1):
+                    segments += [points[k], points[k+1]]
+                continue
+
+            tris = []
+            for x,y in preview.points:
+                px, py = to_region(x,y)
+                a, b, c, d = (px-4,py-4), (px+4,py-4), (px+4,py+4), (px-4,py+4)
+                tris += [a, b, c, a, c, d]
+                continue
 
-    for Id,font in AllFonts.items():
-        bpy.types.SpaceNodeEditor.draw_handler_remove(font["handler"], "WINDOW")
-    AllFonts.clear()
+            shader.bind()
+            shader.uniform_float("color", preview.color)
+            if segments:
+                batch_for_shader(shader, 'LINES', {"pos":segments}).draw(shader)
+            if tris:
+                batch_for_shader(shader, 'TRIS', {"pos":tris}).draw(shader)
+
+            continue
+
+        return None
+
+    def draw(self):
+
+        font_id = self.font_id
+        region = bpy.context.region
+
+        if self.previews:
+            self.draw_previews(region)
+
+        for (size, color, shadow), ids in self.groups.items():
+
+            blf.color(font_id, *color)
+            blf.size(font_id, size[0], size[1])
+
+            if shadow is not None:
+                  blur, shadow_color, offset = shadow
+                  blf.enable(font_id, blf.SHADOW)
+                  blf.shadow(font_id, blur, *shadow_color)
+                  blf.shadow_offset(font_id, *offset)
+            else: blf.disable(font_id, blf.SHADOW)
+
+            for Id in ids:
+                item = self.items[Id]
+                pos_x, pos_y = item["position"]
+                if item["from_right"]:
+                    pos_x = region.width - pos_x
+                if item["from_top"]:
+                    pos_y = region.height - pos_y
+                blf.position(font_id, pos_x, pos_y, 0)
+                blf.draw(font_id, item["text"])
+                continue
+
+            continue
+
+        return None
+
+
+NoodlerOverlay = Overlay()
+
+def overlay_expire():
+    """timer removing expired overlay texts"""
+
+    interval = NoodlerOverlay.expire()
+
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if (area.type=="NODE_EDITOR"):
+                area.tag_redraw()
+            continue
+        continue
+
+    return interval
+
+
+def blf_add_font(text="Hello World", size=[50,72], position=[2,180], color=[1,1,1,0.1], origin="BOTTOM LEFT", shadow={"blur":3,"color":[0,0,0,0.6],"offset":[2,-2],}, duration=None):
+    """add text to the overlay"""
+
+    return NoodlerOverlay.add(text, size, position, color, origin, shadow, duration=duration)
+
+
+def blf_clear_all_fonts(Id=None):
+    """clear all fond appended"""
+
+    NoodlerOverlay.remove(Id)
 
     return None 
 
 
 def blf_temporary_msg(text="", size=[], position=[], origin="", color=None, shadow={}, clear_before=True, first_interval=1.0):
 
-    blf_clear_all_fonts()
-    Id = blf_add_font(text=text, size=size, position=position, origin=origin, color=color, shadow=shadow)
-    def remove_handler_shortly():
-        blf_clear_all_fonts(Id)
-        return None 
-    bpy.app.timers.register(remove_handler_shortly, first_interval=first_interval)
+    if clear_before:
+        blf_clear_all_fonts()
+    blf_add_font(text=text, size=size, position=position, origin=origin, color=color, shadow=shadow, duration=first_interval)
 
     return None 
 
@@ -242,71 +482,627 @@ def get_dpifac():
     return prefs.dpi * prefs.pixel_size / 72
 
 
-def get_node_at_pos(nodes, context, event, position=None, allow_reroute=True, forbidden=None): #TODO could optimize this function by checking if node visible in current user area
-    """get mouse near cursor, 
-    source: node_wrangler.py"""
+class NodeSnapshot():
+    """bulk geometry of a nodetree stored in numpy arrays. locations/dimensions are read with foreach_get on each update,
+    names/types/parents need a python loop, they are only re-read when the nodes count changed, when the tree got
+    a depsgraph update (rename, reparent..) marking the snapshot stale, or when a node name lookup misses"""
+
+    def __init__(self, nodes):
+
+        self.count = 0
+        self.names = [] #node index -> node name
+        self.types = [] #node index -> node type
+        self.index = {} #node name -> node index
+        self.parents = numpy.empty(0, dtype=numpy.int32) #node index -> parent index, -1 if no parent
+        self.is_frame = numpy.empty(0, dtype=bool)
+        self.is_reroute = numpy.empty(0, dtype=bool)
+        self.fixed_frames = {} #index of frames with shrink disabled -> their own (width, height)
+        self.locations = numpy.empty((0,2), dtype=numpy.float32) #local locations
+        self.dimensions = numpy.empty((0,2), dtype=numpy.float32) #dimensions, already divided by dpifac
+        self.absolute = numpy.empty((0,2), dtype=numpy.float32) #global locations (top left corner)
+        self.signature = None
+        self.frame_signature = None #only changes if a frame moved or a node got reparented
+        self.generation = 0 #incremented on each structure read, part of the signature
+        self.stale = True #structure must be read again on next update
+
+        self.update(nodes)
+
+    def read_structure(self, nodes):
+        """python loop over nodes, only needed when nodes are added/removed/renamed/reparented"""
+
+        self.names = [n.name for n in nodes]
+        self.types = [n.type for n in nodes]
+        self.index = {name:i for i,name in enumerate(self.names)}
+        self.parents = numpy.array([self.index[n.parent.name] if (n.parent is not None) else -1 for n in nodes], dtype=numpy.int32)
+        self.is_frame = numpy.array([t=="FRAME" for t in self.types], dtype=bool)
+        self.is_reroute = numpy.array([t=="REROUTE" for t in self.types], dtype=bool)
+        self.fixed_frames = {i:(n.width, n.height) for i,(n,t) in enumerate(zip(nodes, self.types)) if (t=="FRAME") and (not n.shrink)}
+        self.generation += 1
+        self.stale = False
 
-    nodes_near_mouse = []
-    nodes_under_mouse = []
-    target_node = None
+        return None
+
+    def update(self, nodes, force=False):
+        """refresh arrays in bulk, return True if anything changed"""
+
+        count = len(nodes)
+        locs = numpy.empty(count*2, dtype=numpy.float32)
+        dims = numpy.empty(count*2, dtype=numpy.float32)
+        nodes.foreach_get("location", locs)
+        nodes.foreach_get("dimensions", dims)
+        locs.shape = dims.shape = (count,2)
+
+        #names & parents can change without any node moving (rename, frame reparented), we rely on the stale flag for these
+        if force or self.stale or (count!=self.count):
+            self.read_structure(nodes)
+
+        signature = hash((count, locs.tobytes(), dims.tobytes(), self.generation))
+        if (signature==self.signature):
+            return False
+
+        self.count = count
+        self.signature = signature
+        self.locations = locs
+        self.dimensions = dims/get_dpifac()
+
+        #resolve global locations of nested frames, one vectorized pass per nesting level
+        absolute = locs.copy()
+        parents = self.parents.copy()
+        nested = parents>=0
+        while nested.any():
+            absolute[nested] += locs[parents[nested]]
+            parents[nested] = self.parents[parents[nested]]
+            nested = parents>=0
+        self.absolute = absolute
+        self.frame_signature = hash((count, self.parents.tobytes(), locs[self.is_frame].tobytes()))
+
+        return True
+
+    def get_index(self, node):
+        """index of the given node, the structure is read again if the name is unknown. None if still not found"""
+
+        i = self.index.get(node.name)
+        if (i is None):
+            self.update(node.id_data.nodes, force=True)
+            i = self.index.get(node.name)
+
+        return i
+
+    def get_rects(self):
+        """global rectangles as (xmin, ymin, xmax, ymax) arrays"""
+
+        xmin = self.absolute[:,0]
+        ymax = self.absolute[:,1]
+
+        return xmin, ymax-self.dimensions[:,1], xmin+self.dimensions[:,0], ymax
 
-    x, y = position
 
-    # Make a list of each corner (and middle of border) for each node.
-    # Will be sorted to find nearest point and thus nearest node
-    node_points_with_dist = []
+NodeSnapshots = {}
 
-    for n in nodes:
-        if (n.type == 'FRAME'):  # no point trying to link to a frame node
+def get_tree_snapshot(nodes):
+    """get the geometry snapshot of a nodetree, refreshed in bulk on each call"""
+
+    global NodeSnapshots
+
+    key = nodes.id_data.as_pointer()
+    snap = NodeSnapshots.get(key)
+
+    if (snap is None):
+          snap = NodeSnapshots[key] = NodeSnapshot(nodes)
+    else: snap.update(nodes)
+
+    return snap
+
+
+FrameOffsets = {}
+
+def get_frame_offsets(nodes, refresh=False):
+    """frame name -> accumulated global offset of its content, memoized per tree.
+    every operator using it must refresh it on invoke, frames can be moved outside of noodler.
+    a refresh re-reads the snapshot, the table is only rebuilt if a frame moved or a node got reparented"""
+
+    global FrameOffsets
+
+    key = nodes.id_data.as_pointer()
+    table = FrameOffsets.get(key)
+
+    if (table is not None) and (not refresh):
+        return table["offsets"]
+
+    snap = get_tree_snapshot(nodes)
+    if (table is None) or (table["signature"]!=snap.frame_signature):
+        frames = numpy.flatnonzero(snap.is_frame).tolist()
+        table = FrameOffsets[key] = {
+            "signature":snap.frame_signature,
+            "offsets":{snap.names[i]:tuple(snap.absolute[i].tolist()) for i in frames},
+            }
+
+    return table["offsets"]
+
+
+def invalidate_frame_offsets(nodes):
+    """to call after reparenting nodes or moving frames"""
+
+    global FrameOffsets
+
+    key = nodes.id_data.as_pointer()
+    FrameOffsets.pop(key, None)
+    if (key in NodeSnapshots):
+        NodeSnapshots[key].stale = True
+
+    return None
+
+
+class NodeGrid():
+    """uniform grid over absolute node rectangles, used to answer nearest-node & point-in-node queries
+    without scanning the whole tree. nodes are stored by index, we never keep node objects around"""
+
+    def __init__(self, snap):
+
+        self.signature = snap.signature
+        self.rects = {} #node index -> (xmin, ymin, xmax, ymax) in global space
+        self.reroutes = set(numpy.flatnonzero(snap.is_reroute).tolist()) #for allow_reroute filter
+        self.names = snap.names #node index -> node name, for forbidden filter
+        self.cells = {} #(cx,cy) -> list of node indexes overlapping this cell
+        self.cell_size = 100.0
+        self.bounds = None #(cxmin, cymin, cxmax, cymax) in cell unit
+
+        # no point trying to link to a frame node
+        idx = numpy.flatnonzero(~snap.is_frame)
+        if (len(idx)==0):
+            return None
+
+        xmin, ymin, xmax, ymax = (a[idx] for a in snap.get_rects())
+
+        #cell size depends on the average node size, so a node will overlap only a few cells
+        self.cell_size = max(20.0, float(numpy.maximum(xmax-xmin, ymax-ymin).mean()))
+
+        cx1, cy1 = numpy.floor_divide(xmin, self.cell_size).astype(int), numpy.floor_divide(ymin, self.cell_size).astype(int)
+        cx2, cy2 = numpy.floor_divide(xmax, self.cell_size).astype(int), numpy.floor_divide(ymax, self.cell_size).astype(int)
+
+        for k,i in enumerate(idx.tolist()):
+            self.rects[i] = (float(xmin[k]), float(ymin[k]), float(xmax[k]), float(ymax[k]))
+            for cx in range(cx1[k], cx2[k]+1):
+                for cy in range(cy1[k], cy2[k]+1):
+                    self.cells.setdefault((cx,cy),[]).append(i)
             continue
-        if (not allow_reroute and n.type=="REROUTE"):
+
+        self.bounds = (int(cx1.min()), int(cy1.min()), int(cx2.max()), int(cy2.max()))
+
+        return None
+
+    def get_cell(self, x, y):
+        return int(x//self.cell_size), int(y//self.cell_size)
+
+    def query(self, xmin, ymin, xmax, ymax):
+        """indexes of nodes overlapping the given rectangle"""
+
+        (cx1, cy1), (cx2, cy2) = self.get_cell(xmin, ymin), self.get_cell(xmax, ymax)
+        found = set()
+
+        for cx in range(cx1, cx2+1):
+            for cy in range(cy1, cy2+1):
+                found.update(self.cells.get((cx,cy),[]))
             continue
-        if (forbidden is not None) and (n in forbidden):
+
+        return [i for i in found if (self.rects[i][0]<=xmax) and (xmin<=self.rects[i][2]) and (self.rects[i][1]<=ymax) and (ymin<=self.rects[i][3])]
+
+    def is_allowed(self, i, allow_reroute, forbidden):
+        if (not allow_reroute and i in self.reroutes):
+            return False
+        if (self.names[i] in forbidden):
+            return False
+        return True
+
+    def get_dist(self, i, x, y):
+        """distance from the nearest corner (or middle of border) of the given node rectangle"""
+
+        xmin, ymin, xmax, ymax = self.rects[i]
+        xmid, ymid = (xmin+xmax)/2, (ymin+ymax)/2
+
+        return min(hypot(x-px, y-py) for px,py in (
+            (xmin,ymax), (xmax,ymax), (xmin,ymin), (xmax,ymin), #corners
+            (xmid,ymax), (xmid,ymin), (xmin,ymid), (xmax,ymid), #middle of borders
+            ))
+
+    def under(self, x, y, allow_reroute=True, forbidden=set()):
+        """indexes of all nodes containing the given point"""
+
+        found = []
+        for i in self.cells.get(self.get_cell(x, y),[]):
+            if not self.is_allowed(i, allow_reroute, forbidden):
+                continue
+            xmin, ymin, xmax, ymax = self.rects[i]
+            if (xmin <= x <= xmax) and (ymin <= y <= ymax):
+                found.append(i)
             continue
 
-        locx, locy = get_node_location(n,nodes)
-        dimx, dimy = n.dimensions.x/get_dpifac(), n.dimensions.y/get_dpifac()
+        return found
 
-        node_points_with_dist.append([n, hypot(x - locx, y - locy)])  # Top Left
-        node_points_with_dist.append([n, hypot(x - (locx + dimx), y - locy)])  # Top Right
-        node_points_with_dist.append([n, hypot(x - locx, y - (locy - dimy))])  # Bottom Left
-        node_points_with_dist.append([n, hypot(x - (locx + dimx), y - (locy - dimy))])  # Bottom Right
+    def get_ring(self, cx, cy, ring):
+        """cells on the border of a square ring around the given cell, clipped to the grid bounds"""
 
-        node_points_with_dist.append([n, hypot(x - (locx + (dimx / 2)), y - locy)])  # Mid Top
-        node_points_with_dist.append([n, hypot(x - (locx + (dimx / 2)), y - (locy - dimy))])  # Mid Bottom
-        node_points_with_dist.append([n, hypot(x - locx, y - (locy - (dimy / 2)))])  # Mid Left
-        node_points_with_dist.append([n, hypot(x - (locx + dimx), y - (locy - (dimy / 2)))])  # Mid Right
+        cxmin, cymin, cxmax, cymax = self.bounds
 
-        continue
+        if (ring==0):
+            if (cxmin <= cx <= cxmax) and (cymin <= cy <= cymax):
+                yield cx, cy
+            return None
 
-    nearest_node = sorted(node_points_with_dist, key=lambda k: k[1])[0][0]
+        x1, x2 = max(cx-ring, cxmin), min(cx+ring, cxmax)
+        y1, y2 = max(cy-ring+1, cymin), min(cy+ring-1, cymax)
 
-    for n in nodes:
-        if (n.type == 'FRAME'):  # no point trying to link to a frame node
+        #bottom & top rows, corners included
+        for gy in (cy-ring, cy+ring):
+            if (cymin <= gy <= cymax):
+                for gx in range(x1, x2+1):
+                    yield gx, gy
             continue
-        if (not allow_reroute and n.type=="REROUTE"):
+
+        #left & right columns, corners excluded
+        for gx in (cx-ring, cx+ring):
+            if (cxmin <= gx <= cxmax):
+                for gy in range(y1, y2+1):
+                    yield gx, gy
             continue
-        if (forbidden is not None) and (n in forbidden):
+
+        return None
+
+    def nearest(self, x, y, allow_reroute=True, forbidden=set()):
+        """index of nearest node, searching cells ring by ring around the given point"""
+
+        if (self.bounds is None):
+            return None
+
+        cx, cy = self.get_cell(x, y)
+        cxmin, cymin, cxmax, cymax = self.bounds
+
+        #rings closer than the grid bounds are empty, rings further than its farthest corner too
+        first_ring = max(0, cxmin-cx, cx-cxmax, cymin-cy, cy-cymax)
+        max_ring = max(abs(cx-cxmin), abs(cx-cxmax), abs(cy-cymin), abs(cy-cymax))
+
+        best, best_dist = None, None
+        visited = set()
+
+        for ring in range(first_ring, max_ring+1):
+
+            #only the border of the ring, inner cells are already checked
+            for cell in self.get_ring(cx, cy, ring):
+                for i in self.cells.get(cell,[]):
+                    if (i in visited):
+                        continue
+                    visited.add(i)
+                    if not self.is_allowed(i, allow_reroute, forbidden):
+                        continue
+                    dist = self.get_dist(i, x, y)
+                    if (best_dist is None) or (dist < best_dist):
+                        best, best_dist = i, dist
+                    continue
+
+            #every unchecked cell is further away than this ring
+            if (best_dist is not None) and (best_dist <= ring*self.cell_size):
+                break
+
             continue
-            
-        locx, locy = get_node_location(n,nodes)
-        dimx, dimy = n.dimensions.x/get_dpifac(), n.dimensions.y/get_dpifac()
 
-        if (locx <= x <= locx+dimx) and (locy-dimy <= y <= locy):
-            nodes_under_mouse.append(n)
+        return best
 
-        continue
 
+NodeGrids = {}
+
+def get_node_grid(nodes):
+    """get the spatial index of a nodetree, rebuilt only if nodes locations/dimensions changed"""
+
+    global NodeGrids
+
+    snap = get_tree_snapshot(nodes)
+    key = nodes.id_data.as_pointer()
+    grid = NodeGrids.get(key)
+
+    if (grid is None) or (grid.signature != snap.signature):
+        grid = NodeGrids[key] = NodeGrid(snap)
+
+    return grid
+
+
+def get_node_at_pos(nodes, context, event, position=None, allow_reroute=True, forbidden=None):
+    """get mouse near cursor, 
+    source: node_wrangler.py, using a spatial index"""
+
+    x, y = position
+    grid = get_node_grid(nodes)
+
+    #forbidden nodes compared by name
+    forbidden = {n.name for n in forbidden if (n is not None)} if (forbidden is not None) else set()
+
+    nearest = grid.nearest(x, y, allow_reroute=allow_reroute, forbidden=forbidden)
+    if (nearest is None):
+        return None
+
+    nodes_under_mouse = grid.under(x, y, allow_reroute=allow_reroute, forbidden=forbidden)
+
+    # use the node under the mouse if there is one and only one, else use the nearest node
     if (len(nodes_under_mouse)==1):
+        return nodes[nodes_under_mouse[0]]
+
+    return nodes[nearest]
+
+
+# ooooooooo.                       .o88o.  o8o  oooo
+# `888   `Y88.                     888 `"  `"'  `888
+#  888   .d88' oooo d8b  .ooooo.  o888oo  oooo   888   .ooooo.  oooo d8b
+#  888ooo88P'  `888""8P d88' `88b  888    `888   888  d88' `88b `888""8P
+#  888          888     888   888  888     888   888  888ooo888  888
+#  888          888     888   888  888     888   888  888    .o  888
+# o888o        d888b    `Y8bod8P' o888o   o888o o888o `Y8bod8P' d888b
+
+
+class Profiler():
+    """opt-in timings of operators methods & properties updates, each modal call is a tick.
+    wrappers are always installed, they only time when enabled"""
+
+    buckets = (1, 2, 4, 8, 16, 33, 66, 125, 250, 500, 1000) #histogram upper bounds in ms, last bin is overflow
+    slowest_len = 20
+
+    def __init__(self):
+
+        self.enabled = False
+        self.diagnostics = False #also count nodetree writes & depsgraph updates, costly
+        self.stats = {} #key -> {"calls","total","max","histogram","writes","depsgraph"}
+        self.slowest = [] #min heap of (ms, timestamp, key)
+        self.last_key = None #last profiled call, depsgraph updates are evaluated after it returned
+        self.last_time = 0.0
+
+    def get_stat(self, key):
+
+        stat = self.stats.get(key)
+        if (stat is None):
+            stat = self.stats[key] = {"calls":0, "total":0.0, "max":0.0, "histogram":[0]*(len(self.buckets)+1), "writes":{}, "depsgraph":0}
+
+        return stat
+
+    def record_writes(self, key, writes):
+
+        total = self.get_stat(key)["writes"]
+        for attr, count in writes.items():
+            total[attr] = total.get(attr,0) + count
+            continue
+
+        return None
+
+    def record_depsgraph(self, count=1):
+        """depsgraph update_post, attributed to the last profiled call"""
+
+        #updates long after our last call are not ours
+        if (self.last_key is not None) and (time.perf_counter()-self.last_time < 0.5):
+            self.get_stat(self.last_key)["depsgraph"] += count
+
+        return None
+
+    def record(self, key, ms):
+
+        self.last_key, self.last_time = key, time.perf_counter()
+        stat = self.get_stat(key)
+
+        stat["calls"] += 1
+        stat["total"] += ms
+        stat["max"] = max(stat["max"], ms)
+        stat["histogram"][bisect_left(self.buckets, ms)] += 1
+
+        item = (ms, time.time(), key)
+        if (len(self.slowest) < self.slowest_len):
+              heapq.heappush(self.slowest, item)
+        elif (ms > self.slowest[0][0]):
+              heapq.heapreplace(self.slowest, item)
+
+        return None
+
+    def reset(self):
+
+        self.stats.clear()
+        self.slowest.clear()
+        self.last_key = None
+
+        return None
+
+    def get_rows(self):
+        """stats sorted by total time spent"""
+
+        return sorted(self.stats.items(), key=lambda item: item[1]["total"], reverse=True)
+
+    def get_slowest(self):
+
+        return sorted(self.slowest, reverse=True)
+
+    def export(self, filepath):
+
+        data = {
+            "buckets_ms":list(self.buckets),
+            "stats":{ k:dict(v, mean=v["total"]/v["calls"]) for k,v in self.stats.items() },
+            "slowest":[ {"ms":ms, "time":datetime.fromtimestamp(t).isoformat(), "call":key} for ms,t,key in self.get_slowest() ],
+            }
+
+        with open(filepath, "w") as f:
+            json.dump(data, f, indent=1)
+
+        return None
+
+
+NoodlerProfiler = Profiler()
+
+
+class WriteProbe():
+    """diagnostics, observe which nodetree properties a call changed by reading them in bulk before & after.
+    python can't hook rna writes, so writing an identical value is not seen"""
+
+    attrs = {"select":1, "location":2, "color":3, "use_custom_color":1, "mute":1, "hide":1,} #attr -> item size
+
+    def __init__(self, node_tree):
+
+        self.node_tree = node_tree
+        self.before = self.read()
+
+    def read(self):
+
+        nodes = self.node_tree.nodes
+        count = len(nodes)
+        state = {"names":[n.name for n in nodes], "links":len(self.node_tree.links)}
+
+        for attr, size in self.attrs.items():
+            arr = numpy.empty(count*size, dtype=numpy.float32)
+            nodes.foreach_get(attr, arr)
+            state[attr] = arr.reshape(count,size)
+            continue
+
+        state["parent"] = [n.parent.name if n.parent else "" for n in nodes]
+
+        return state
+
+    def diff(self):
+        """changed properties counts, on nodes existing before & after"""
 
-        if nodes_under_mouse[0] != nearest_node:
-              target_node = nodes_under_mouse[0]  # use the node under the mouse if there is one and only one
-        else: target_node = nearest_node  # else use the nearest node
+        before, after = self.before, self.read()
+        writes = {}
+
+        index = {name:i for i,name in enumerate(after["names"])}
+        common = [(i,index[name]) for i,name in enumerate(before["names"]) if (name in index)]
+        ib = numpy.array([i for i,_ in common], dtype=numpy.int64)
+        ia = numpy.array([j for _,j in common], dtype=numpy.int64)
+
+        for attr in self.attrs:
+            writes[attr] = int(numpy.any(before[attr][ib]!=after[attr][ia], axis=1).sum()) if len(common) else 0
+            continue
+
+        writes["parent"] = sum(before["parent"][i]!=after["parent"][j] for i,j in common)
+        writes["nodes_added"] = len(after["names"])-len(common)
+        writes["nodes_removed"] = len(before["names"])-len(common)
+        writes["links_delta"] = after["links"]-before["links"]
+
+        return {k:v for k,v in writes.items() if v}
+
+
+def get_probe_tree(args):
+    """nodetree edited in the context given to the profiled call, if any"""
+
+    context = args[1] if (len(args)>=2) else (args[0] if args else None)
+    space = getattr(context, "space_data", None)
+    if (space is None) or (space.type!="NODE_EDITOR"):
+        return None
+
+    return space.edit_tree
+
+
+def profile_call(key, func, args):
+
+    if (not NoodlerProfiler.enabled):
+        return func(*args)
+
+    probe = None
+    if NoodlerProfiler.diagnostics:
+        node_tree = get_probe_tree(args)
+        if (node_tree is not None):
+            probe = WriteProbe(node_tree)
+
+    t = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        NoodlerProfiler.record(key, (time.perf_counter()-t)*1000)
+        if (probe is not None):
+            NoodlerProfiler.record_writes(key, probe.diff())
+
+
+def profiled(func):
+    """wrap an operator method, property update or callback. 
+    blender validate the arguments count of operators methods & updates, so wrappers keep it"""
+
+    key = func.__qualname__
+    argcount = func.__code__.co_argcount
+
+    if (argcount==3):
+        def wrapper(self, context, event):
+            return profile_call(key, func, (self, context, event))
+    elif (argcount==2):
+        def wrapper(self, context):
+            return profile_call(key, func, (self, context))
     else:
-        target_node = nearest_node
+        def wrapper(*args):
+            return profile_call(key, func, args)
+
+    wrapper.__name__, wrapper.__qualname__, wrapper.__doc__ = func.__name__, func.__qualname__, func.__doc__
+    wrapper.profiled = func
+
+    return wrapper
+
+
+def profile_operator(cls):
+    """wrap operator invoke/modal/execute, once"""
+
+    for attr in ("invoke","modal","execute"):
+        func = cls.__dict__.get(attr)
+        if (func is not None) and (not hasattr(func, "profiled")):
+            setattr(cls, attr, profiled(func))
+        continue
+
+    return cls
+
+
+def is_profiling():
+
+    addon = bpy.context.preferences.addons.get(__name__)
+
+    return (addon is not None) and addon.preferences.profiling
+
 
-    return target_node
+def is_diagnosing():
 
+    addon = bpy.context.preferences.addons.get(__name__)
+
+    return (addon is not None) and addon.preferences.profiling and addon.preferences.diagnostics
+
+
+def profiling_upd(self, context):
+
+    NoodlerProfiler.enabled = self.profiling
+    NoodlerProfiler.diagnostics = self.profiling and self.diagnostics
+
+    return None
+
+
+class NOODLER_OT_profiler_reset(bpy.types.Operator):
+
+    bl_idname      = "noodler.profiler_reset"
+    bl_label       = "Reset Profiler"
+    bl_description = "Clear all recorded timings"
+
+    def execute(self, context):
+
+        NoodlerProfiler.reset()
+
+        return {"FINISHED"}
+
+
+class NOODLER_OT_profiler_export(bpy.types.Operator):
+
+    bl_idname      = "noodler.profiler_export"
+    bl_label       = "Export Profiler"
+    bl_description = "Export recorded timings as json"
+
+    filepath : bpy.props.StringProperty(subtype="FILE_PATH", default="noodler_profile.json")
+    filter_glob : bpy.props.StringProperty(default="*.json", options={"HIDDEN"})
+
+    def invoke(self, context, event):
+
+        context.window_manager.fileselect_add(self)
+
+        return {"RUNNING_MODAL"}
+
+    def execute(self, context):
+
+        NoodlerProfiler.export(bpy.path.abspath(self.filepath))
+        self.report({"INFO"}, f"Noodler: profile exported to {self.filepath}")
+
+        return {"FINISHED"}
 
 
 # oooooooooo.                                            oooooooooooo
@@ -319,24 +1115,35 @@ def get_node_at_pos(nodes, context, event, position=None, allow_reroute=True, fo
 
 
 
-def get_nodes_in_frame_box(boxf, nodes, frame_support=True,):
-    """search node that can potentially be inside this boxframe created box"""
+def get_nodes_in_rect(nodes, rect, exclude=-2):
+    """indexes of nodes which location is inside the given global (xmin, ymin, xmax, ymax) rectangle. frames & children of exclude are ignored"""
 
-    for n in nodes:
+    snap = get_tree_snapshot(nodes)
+    if (snap.count==0):
+        return []
 
-        #we do not want information on ourselves
-        if ((n==boxf) or (n.parent==boxf)):
-            continue
+    locx, locy = snap.absolute[:,0], snap.absolute[:,1]
+    xmin, ymin, xmax, ymax = rect
 
-        #for now, completely impossible to get a frame location..
-        if (n.type=="FRAME"):
-            continue
+    #we do not want information on ourselves, and for now, completely impossible to get a frame location..
+    mask = ~snap.is_frame & (numpy.arange(snap.count)!=exclude) & (snap.parents!=exclude)
+    mask &= (xmin<=locx) & (locx<=xmax) & (ymin<=locy) & (locy<=ymax)
 
-        locx,locy = get_node_location(n,nodes)
+    return numpy.flatnonzero(mask).tolist()
 
-        if boxf.location.x <= locx <= (boxf.location.x + boxf.dimensions.x) and \
-           boxf.location.y >= locy >= (boxf.location.y - boxf.dimensions.y):
-            yield n
+
+def get_nodes_in_frame_box(boxf, nodes, frame_support=True,):
+    """search node that can potentially be inside this boxframe created box"""
+
+    snap = get_tree_snapshot(nodes)
+    if (snap.count==0):
+        return None
+
+    bx, by = boxf.location
+    bw, bh = boxf.dimensions
+
+    for i in get_nodes_in_rect(nodes, (bx, by-bh, bx+bw, by), exclude=snap.index.get(boxf.name, -2)):
+        yield nodes[i]
 
 
 class NOODLER_OT_draw_frame(bpy.types.Operator):
@@ -352,7 +1159,11 @@ class NOODLER_OT_draw_frame(bpy.types.Operator):
         self.old = (0,0)
         self.timer = None 
         self.init_time = None
-        self.selframerate = 0.350 #selection refreshrate in s, const
+        self.selframerate = 0.016 #selection refreshrate in s, const
+        self.previewed = set() #names of nodes selected by the live preview
+        self.preview = None #PreviewModel if deferred, the frame is only created on confirm
+        self.rect = None #deferred box global rectangle
+        self.init_select = None #selection bitset before invoke
 
     @classmethod
     def poll(cls, context):        
@@ -366,12 +1177,35 @@ class NOODLER_OT_draw_frame(bpy.types.Operator):
         ensure_mouse_cursor(context, event)
         self.old = context.space_data.cursor_location.copy()  
 
-        boxf = ng.nodes.new("NodeFrame")
-        self.boxf = boxf 
+        #live preview only write selection difference afterwards, initial selection restored on cancel
+        self.init_select = save_node_select(ng.nodes)
+        set_all_node_select(ng.nodes,False)
+
+        #deferred preview? box is only drawn until confirm
+        if is_deferred_preview():
+            self.rect = (self.old.x, self.old.y, self.old.x, self.old.y)
+            self.preview = PreviewModel()
+            self.preview.show()
+        else: 
+            self.boxf = self.new_frame(context, self.old)
+
+        #start timer, needed to regulate a function refresh rate
+        self.timer = context.window_manager.event_timer_add(self.selframerate, window=context.window)
+        self.init_time = datetime.now()
+
+        #start modal 
+        context.window_manager.modal_handler_add(self)
+
+        return {'RUNNING_MODAL'}
+
+    def new_frame(self, context, location, width=0, height=0):
+        """create the frame with user scene settings"""
+
+        boxf = self.node_tree.nodes.new("NodeFrame")
         boxf.bl_width_min = boxf.bl_height_min = 20
-        boxf.width = boxf.height = 0
+        boxf.width, boxf.height = width, height
         boxf.select = False
-        boxf.location = self.old
+        boxf.location = location
 
         noodle_scn = context.scene.noodler
         boxf.use_custom_color = noodle_scn.frame_use_custom_color
@@ -379,14 +1213,34 @@ class NOODLER_OT_draw_frame(bpy.types.Operator):
         boxf.label = noodle_scn.frame_label
         boxf.label_size = noodle_scn.frame_label_size
 
-        #start timer, needed to regulate a function refresh rate
-        self.timer = context.window_manager.event_timer_add(self.selframerate, window=context.window)
-        self.init_time = datetime.now()
+        return boxf
 
-        #start modal 
-        context.window_manager.modal_handler_add(self)
+    def commit_preview(self, context):
+        """deferred mode, write the frame & parenting all at once"""
 
-        return {'RUNNING_MODAL'}
+        nodes = self.node_tree.nodes
+        xmin, ymin, xmax, ymax = self.rect
+        dpifac = get_dpifac()
+
+        self.preview.hide()
+
+        #if box is too small, just cancel
+        if ((xmax-xmin)*dpifac<30 and (ymax-ymin)*dpifac<30):
+            return False
+
+        children = [nodes[i] for i in get_nodes_in_rect(nodes, self.rect)]
+        self.boxf = self.new_frame(context, (xmin,ymax), width=xmax-xmin, height=ymax-ymin)
+
+        for n in children:
+            n.parent = self.boxf
+            continue
+
+        invalidate_frame_offsets(nodes)
+
+        nodes.active = self.boxf
+        self.boxf.select = True
+
+        return True
 
     def modal(self, context, event):     
 
@@ -395,7 +1249,12 @@ class NOODLER_OT_draw_frame(bpy.types.Operator):
         #if user confirm:
         
         if ((event.value=="RELEASE") or (event.type=="LEFTMOUSE")):
-                    
+
+            if (self.preview is not None):
+                is_valid = self.commit_preview(context)
+                context.window_manager.event_timer_remove(self.timer)
+                return {'FINISHED'} if is_valid else {'CANCELLED'}
+
             #if box is too small, just cancel
             if (self.boxf.dimensions.x <30 and self.boxf.dimensions.y <30):
                 self.cancel(context)
@@ -410,7 +1269,9 @@ class NOODLER_OT_draw_frame(bpy.types.Operator):
                 n.parent = self.boxf
                 continue
 
-            set_all_node_select(self.node_tree.nodes,False)
+            invalidate_frame_offsets(self.node_tree.nodes)
+
+            self.preview_selection(set())
             self.node_tree.nodes.active = self.boxf
             self.boxf.select = True
 
@@ -437,6 +1298,22 @@ class NOODLER_OT_draw_frame(bpy.types.Operator):
         new = context.space_data.cursor_location
         old = self.old
 
+        #deferred? only the preview model is edited
+        if (self.preview is not None):
+
+            self.rect = (min(old.x,new.x), min(old.y,new.y), max(old.x,new.x), max(old.y,new.y))
+            self.preview.rects[:1] = [self.rect]
+
+            if (event.type != 'TIMER'):
+                return {'RUNNING_MODAL'}
+
+            #highlight the future children
+            xmin, ymin, xmax, ymax = get_tree_snapshot(self.node_tree.nodes).get_rects()
+            idx = get_nodes_in_rect(self.node_tree.nodes, self.rect)
+            self.preview.rects[1:] = [(xmin[i], ymin[i], xmax[i], ymax[i]) for i in idx]
+
+            return {'RUNNING_MODAL'}
+
         #new y above init y
         if (old.y<=new.y):
               self.boxf.location.y = new.y
@@ -451,22 +1328,42 @@ class NOODLER_OT_draw_frame(bpy.types.Operator):
 
         #dybamic selection:
 
-        #enable every 100ms, too slow for python.. 
+        #refresh at display rate, we only write the selection difference
         if (event.type != 'TIMER'):
             return {'RUNNING_MODAL'}
 
         #show user a preview off the future node
-        set_all_node_select(self.node_tree.nodes,False)
-        for n in get_nodes_in_frame_box(self.boxf,self.node_tree.nodes):
-            n.select = True
-            continue
+        self.preview_selection({n.name for n in get_nodes_in_frame_box(self.boxf,self.node_tree.nodes)})
 
         return {'RUNNING_MODAL'}
 
+    def preview_selection(self, names):
+        """select given nodes names, only writing select on nodes which state changed since last preview"""
+
+        nodes = self.node_tree.nodes
+
+        for name in self.previewed - names:
+            n = nodes.get(name)
+            if (n is not None):
+                n.select = False
+            continue
+
+        for name in names - self.previewed:
+            nodes[name].select = True
+            continue
+
+        self.previewed = names
+
+        return None
+
     def cancel(self, context):
 
-        self.node_tree.nodes.remove(self.boxf)
-        set_all_node_select(self.node_tree.nodes,False)
+        if (self.preview is not None):
+            self.preview.hide()
+        else: 
+            self.node_tree.nodes.remove(self.boxf)
+
+        restore_node_select(self.node_tree.nodes, self.init_select)
 
         context.area.tag_redraw()
         context.window_manager.event_timer_remove(self.timer)
@@ -474,6 +1371,304 @@ class NOODLER_OT_draw_frame(bpy.types.Operator):
         return None 
 
 
+class DisjointSet():
+    """union find over indexes, with path halving"""
+
+    def __init__(self, count):
+        self.parent = list(range(count))
+
+    def find(self, i):
+
+        parent = self.parent
+        while parent[i]!=i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+
+        return i
+
+    def union(self, i, j):
+
+        a, b = self.find(i), self.find(j)
+        if (a!=b):
+            self.parent[max(a,b)] = min(a,b)
+
+        return None
+
+    def groups(self, indexes):
+        """indexes grouped by root, in first seen order"""
+
+        groups = {}
+        for i in indexes:
+            groups.setdefault(self.find(i),[]).append(i)
+            continue
+
+        return list(groups.values())
+
+
+def get_component_clusters(graph, candidates):
+    """connected components, links followed in both directions"""
+
+    ds = DisjointSet(len(graph.names))
+    for i in range(len(graph.names)):
+        for j in graph.down_idx[graph.down_ptr[i]:graph.down_ptr[i+1]]:
+            ds.union(i, j)
+        continue
+
+    return ds.groups(candidates)
+
+
+def get_spatial_clusters(snap, candidates, distance=80):
+    """density clustering, dbscan with min samples of one: nodes closer than distance (rect gap) are chained in one cluster.
+    neighbors are found with a uniform grid, each rect registered in the cells it covers"""
+
+    if (len(candidates)==0):
+        return []
+
+    xmin, ymin, xmax, ymax = snap.get_rects()
+    idx = numpy.array(candidates, dtype=numpy.int64)
+    half = distance/2
+
+    #rects grown by half the distance overlap if their gap is below distance
+    rects = numpy.stack([xmin[idx]-half, ymin[idx]-half, xmax[idx]+half, ymax[idx]+half], axis=1)
+    cell = max(float(numpy.median(rects[:,2]-rects[:,0])), float(numpy.median(rects[:,3]-rects[:,1])), 1.0)
+    cells_min = numpy.floor(rects[:,:2]/cell).astype(numpy.int64)
+    cells_max = numpy.floor(rects[:,2:]/cell).astype(numpy.int64)
+
+    buckets = {}
+    for k in range(len(idx)):
+        for cx in range(cells_min[k,0], cells_max[k,0]+1):
+            for cy in range(cells_min[k,1], cells_max[k,1]+1):
+                buckets.setdefault((cx,cy),[]).append(k)
+        continue
+
+    ds = DisjointSet(len(idx))
+    for members in buckets.values():
+        if (len(members)<2):
+            continue
+        m = numpy.array(members, dtype=numpy.int64)
+        r = rects[m]
+        overlap = (r[:,None,0]<=r[None,:,2]) & (r[None,:,0]<=r[:,None,2]) & (r[:,None,1]<=r[None,:,3]) & (r[None,:,1]<=r[:,None,3])
+        for a,b in zip(*numpy.nonzero(numpy.triu(overlap,1))):
+            ds.union(int(m[a]), int(m[b]))
+        continue
+
+    return [ [candidates[k] for k in group] for group in ds.groups(range(len(idx))) ]
+
+
+def get_output_clusters(graph, candidates):
+    """(output index, nodes) grouped by the output they feed, a node feeding many outputs goes to the first one"""
+
+    candidates = set(candidates)
+    claimed = set()
+    clusters = []
+
+    for o in [i for i,t in enumerate(graph.types) if (t in OUTPUT_TYPES)]:
+        #'downstream' mode is following inputs
+        cluster = [i for i in graph.closure((o,), mode="downstream") if (i in candidates) and (i not in claimed)]
+        claimed.update(cluster)
+        clusters.append((o,cluster))
+        continue
+
+    return clusters
+
+
+def auto_frame_nodes(node_tree, mode="COMPONENT", distance=80, min_size=2, only_unframed=True, margin=30, style=None):
+    """group nodes in new frames by connected component, spatial proximity or downstream output.
+    all frames are created, sized & filled in one batch, return the list of new frames"""
+
+    nodes = node_tree.nodes
+    graph = get_link_graph(node_tree)
+    snap = get_tree_snapshot(nodes)
+
+    if (snap.count==0) or (snap.count!=len(graph.names)):
+        return []
+
+    candidates = [i for i in range(snap.count) if (not snap.is_frame[i]) and not (only_unframed and snap.parents[i]>=0)]
+
+    if (mode=="OUTPUT"):
+        clusters = [(f"{nodes[o].label or nodes[o].name}", c) for o,c in get_output_clusters(graph, candidates)]
+    else:
+        found = get_spatial_clusters(snap, candidates, distance=distance) if (mode=="SPATIAL") else get_component_clusters(graph, candidates)
+        clusters = [(None, c) for c in found]
+
+    clusters = [(label, c) for label,c in clusters if (len(c)>=min_size)]
+    if (len(clusters)==0):
+        return []
+
+    labels = [label or f"{mode.title()} {k+1}" for k,(label,_) in enumerate(clusters)]
+    clusters = [c for _,c in clusters]
+
+    xmin, ymin, xmax, ymax = snap.get_rects()
+
+    #resolve everything before nodes indexes change
+    members = [[nodes[i] for i in c] for c in clusters]
+    bounds = [(xmin[c].min()-margin, ymin[c].min()-margin, xmax[c].max()+margin, ymax[c].max()+margin) for c in clusters]
+
+    frames = []
+    for children, (x0, y0, x1, y1), label in zip(members, bounds, labels):
+
+        f = nodes.new("NodeFrame")
+        f.location = (float(x0), float(y1))
+        f.width, f.height = float(x1-x0), float(y1-y0)
+        f.label = label
+        if (style is not None):
+            f.use_custom_color = style.frame_use_custom_color
+            f.color = style.frame_color
+            f.label_size = style.frame_label_size
+
+        for n in children:
+            n.parent = f
+            continue
+
+        frames.append(f)
+        continue
+
+    invalidate_frame_offsets(nodes)
+
+    return frames
+
+
+class NOODLER_OT_auto_frame(bpy.types.Operator): #context from node editor only
+
+    bl_idname      = "noodler.auto_frame"
+    bl_label       = "Auto Frame Nodes"
+    bl_description = "Group nodes in new frames automatically"
+    bl_options     = {'REGISTER', 'UNDO'}
+
+    mode : bpy.props.EnumProperty(default="COMPONENT",items=[("COMPONENT","Connected Nodes","One frame per group of linked nodes",),("SPATIAL","Proximity","One frame per group of nodes close to each others",),("OUTPUT","Output","One frame per output, with all the nodes feeding it",),], name="Group By") 
+    distance : bpy.props.FloatProperty(default=80, min=0, name="Distance", description="Proximity mode, maximal gap between nodes of a same frame",)
+    min_size : bpy.props.IntProperty(default=2, min=1, name="Minimal Size", description="Do not frame smaller groups",)
+    only_unframed : bpy.props.BoolProperty(default=True, name="Only Unframed Nodes",)
+
+    @classmethod
+    def poll(cls, context):
+        return (context.space_data.type=="NODE_EDITOR") and (context.space_data.node_tree is not None)
+
+    def execute(self, context):
+
+        ng , _ = get_active_tree(context)
+        frames = auto_frame_nodes(ng, mode=self.mode, distance=self.distance, min_size=self.min_size, only_unframed=self.only_unframed, style=context.scene.noodler)
+        self.report({"INFO"}, f"Noodler: {len(frames)} frame(s) created")
+
+        return {'FINISHED'}
+
+
+def get_frame_rects(snap, margin=30):
+    """global (F,4) rectangles of all frames. the location of a shrinking frame is not reliable, 
+    a shrinking frame with children wrap them (nested frames resolved from the deepest),
+    frames with shrink disabled use their own location & size, empty frames their own location & dimensions"""
+
+    xmin, ymin, xmax, ymax = snap.get_rects()
+    rects = numpy.stack([xmin, ymin, xmax, ymax], axis=1)
+    frames = numpy.flatnonzero(snap.is_frame)
+
+    #children grouped by parent
+    order = numpy.argsort(snap.parents, kind="stable")
+    starts = numpy.searchsorted(snap.parents[order], frames, side="left")
+    ends = numpy.searchsorted(snap.parents[order], frames, side="right")
+    children = {int(f):order[a:b] for f,a,b in zip(frames, starts, ends)}
+
+    #deepest frames first
+    def depth(i):
+        d = 0
+        while snap.parents[i]>=0:
+            i = snap.parents[i]
+            d += 1
+        return d
+
+    for f in sorted(frames.tolist(), key=depth, reverse=True):
+        c = children[f]
+        if (f in snap.fixed_frames):
+            w, h = snap.fixed_frames[f]
+            x, y = snap.absolute[f]
+            rects[f] = (x, y-h, x+w, y)
+        elif len(c):
+            rects[f] = (rects[c,0].min()-margin, rects[c,1].min()-margin, rects[c,2].max()+margin, rects[c,3].max()+margin)
+        continue
+
+    return frames, rects[frames]
+
+
+def get_frames_membership(snap, margin=30, chunk=4096):
+    """for each node, index of the smallest frame fully containing its rectangle, -1 if none.
+    one vectorized containment pass of all nodes against all frames, by chunks to bound memory"""
+
+    frames, frects = get_frame_rects(snap, margin=margin)
+    membership = numpy.full(snap.count, -1, dtype=numpy.int64)
+    if (len(frames)==0):
+        return membership
+
+    xmin, ymin, xmax, ymax = snap.get_rects()
+    rects = numpy.stack([xmin, ymin, xmax, ymax], axis=1)
+
+    #frames use their wrapping rectangle too
+    rects[frames] = frects
+
+    areas = (frects[:,2]-frects[:,0]) * (frects[:,3]-frects[:,1])
+    node_areas = (rects[:,2]-rects[:,0]) * (rects[:,3]-rects[:,1])
+
+    for a in range(0, snap.count, chunk):
+        r = rects[a:a+chunk]
+        inside = (frects[None,:,0]<=r[:,None,0]) & (r[:,None,2]<=frects[None,:,2]) & (frames[None,:]!=numpy.arange(a,a+len(r))[:,None]) \
+               & (frects[None,:,1]<=r[:,None,1]) & (r[:,None,3]<=frects[None,:,3]) & (areas[None,:]>node_areas[a:a+chunk,None])
+        #smallest containing frame wins, nested frames are resolved by area
+        best = numpy.where(inside, areas[None,:], numpy.inf).argmin(axis=1)
+        found = inside[numpy.arange(len(r)),best]
+        membership[a:a+chunk] = numpy.where(found, frames[best], -1)
+        continue
+
+    return membership
+
+
+def reframe_nodes(node_tree, unparent_outside=True, margin=30):
+    """recompute frame membership of every node from its location & reparent in one batch, return the count of reparented nodes"""
+
+    nodes = node_tree.nodes
+    snap = get_tree_snapshot(nodes)
+    if (snap.count==0) or (not snap.is_frame.any()):
+        return 0
+
+    membership = get_frames_membership(snap, margin=margin)
+
+    changed = numpy.flatnonzero(membership!=snap.parents)
+    if (not unparent_outside):
+        changed = changed[membership[changed]>=0]
+    if (len(changed)==0):
+        return 0
+
+    #resolve all nodes before reparenting
+    moves = [(nodes[i], nodes[membership[i]] if (membership[i]>=0) else None) for i in changed.tolist()]
+    for n, frame in moves:
+        n.parent = frame
+        continue
+
+    invalidate_frame_offsets(nodes)
+
+    return len(moves)
+
+
+class NOODLER_OT_reframe_all(bpy.types.Operator): #context from node editor only
+
+    bl_idname      = "noodler.reframe_all"
+    bl_label       = "Re-Frame All"
+    bl_description = "Parent every node to the frame it is visually inside"
+    bl_options     = {'REGISTER', 'UNDO'}
+
+    unparent_outside : bpy.props.BoolProperty(default=True, name="Unparent Outside Nodes", description="Nodes not inside any frame are removed from their frame",)
+
+    @classmethod
+    def poll(cls, context):
+        return (context.space_data.type=="NODE_EDITOR") and (context.space_data.node_tree is not None)
+
+    def execute(self, context):
+
+        ng , _ = get_active_tree(context)
+        count = reframe_nodes(ng, unparent_outside=self.unparent_outside)
+        self.report({"INFO"}, f"Noodler: {count} node(s) reparented")
+
+        return {'FINISHED'}
+
+
 # oooooooooo.                                            ooooooooo.                             .
 # `888'   `Y8b                                           `888   `Y88.                         .o8
 #  888      888 oooo d8b  .oooo.   oooo oooo    ooo       888   .d88'  .ooooo.  oooo  oooo  .o888oo  .ooooo.
@@ -509,9 +1704,17 @@ class NOODLER_OT_draw_route(bpy.types.Operator):
         self.wheel_out = 0
         self.out_link = None 
         self.nearest = None
+        self.nearest_rect = None #global rectangle of nearest, target is only resolved again once the cursor leave it
+        self.availsock_cache = {} #node name -> available input sockets indexes
         #keep track of if we created inputs on GROUP_OUTPUT type
         self.gr_out_init_len = None
 
+        #deferred preview, the moving reroute is only written on click
+        self.preview = None
+        self.preview_loc = None
+
+        self.init_select = None #selection bitset before invoke
+
     @classmethod
     def poll(cls, context):        
         return (context.space_data.type=="NODE_EDITOR") and (context.space_data.node_tree is not None)
@@ -520,13 +1723,17 @@ class NOODLER_OT_draw_route(bpy.types.Operator):
 
         if mode=="add":
               shadow = {"blur":5,"color":[0,0,0,1],"offset":[1,-1],} ; color = [0.9,0.9,0.9,0.9] ; origin = "BOTTOM LEFT" ; size = [25,45]
+              blf_add_font(text="[SHFT+ALT] Link to node with auto-route", size=size, position=[20,220], origin=origin, color=color, shadow=shadow)
               blf_add_font(text="[SHFT] Link to node", size=size, position=[20,190], origin=origin, color=color, shadow=shadow)
               blf_add_font(text="[CTRL] Snapping", size=size, position=[20,160], origin=origin, color=color, shadow=shadow)
               blf_add_font(text="[DEL] Backstep", size=size, position=[20,130], origin=origin, color=color, shadow=shadow)
               blf_add_font(text="[LEFTMOUSE] Add reroute/Confirm link", size=size, position=[20,100], origin=origin, color=color, shadow=shadow)
               blf_add_font(text="[ENTER] Confirm reroute", size=size, position=[20,70], origin=origin, color=color, shadow=shadow)
               blf_add_font(text="[MOUSEWHEEL] Loop Sockets", size=size, position=[20,40], origin=origin, color=color, shadow=shadow)
-        else: blf_clear_all_fonts(Id=None)
+        else: 
+            blf_clear_all_fonts(Id=None)
+            if (self.preview is not None):
+                self.preview.hide()
 
         bpy.context.area.tag_redraw()
 
@@ -551,12 +1758,22 @@ class NOODLER_OT_draw_route(bpy.types.Operator):
             if (len(self.from_active.outputs)==0):
                 return {'FINISHED'}
 
+        #frames could have been moved outside of noodler since the last invocation
+        get_frame_offsets(nodes, refresh=True)
+
+        #restored on cancel
+        self.init_select = save_node_select(nodes)
+
         #store init mouse location
         ensure_mouse_cursor(context, event)
         self.init_click = context.space_data.cursor_location.copy()  
 
         self.add_reroute(context,event)
 
+        if is_deferred_preview():
+            self.preview = PreviewModel()
+            self.preview.show()
+
         self.bfl_message()
 
         #start modal 
@@ -608,6 +1825,10 @@ class NOODLER_OT_draw_route(bpy.types.Operator):
             rr1 = self.old_rr = self.new_rr
             outp = rr1.outputs[0]
 
+            #deferred? the reroute did not follow the cursor, write its final location now
+            if (self.preview is not None) and (self.preview_loc is not None):
+                rr1.location = self.preview_loc
+
             self.last_click = rr1.location.copy()
 
         #register internal click
@@ -653,6 +1874,9 @@ class NOODLER_OT_draw_route(bpy.types.Operator):
         set_all_node_select(self.node_tree.nodes,False)
         self.new_rr.select = True
 
+        #deferred? new_rr is already at its final location
+        self.preview_loc = None
+
         #if backstep to the init beginning:
         if (len(self.created_rr)==1):
 
@@ -665,6 +1889,33 @@ class NOODLER_OT_draw_route(bpy.types.Operator):
         
         return None 
 
+    def get_target_rect(self, node):
+        """global rectangle of given node as (xmin, ymin, xmax, ymax)"""
+
+        locx, locy = get_node_location(node, self.node_tree.nodes)
+        dimx, dimy = node.dimensions.x/get_dpifac(), node.dimensions.y/get_dpifac()
+
+        return locx, locy-dimy, locx+dimx, locy
+
+    def is_in_target(self, cursor):
+
+        if (self.nearest_rect is None):
+            return False
+        xmin, ymin, xmax, ymax = self.nearest_rect
+
+        return (xmin <= cursor.x <= xmax) and (ymin <= cursor.y <= ymax)
+
+    def get_available_sockets(self, node):
+        """indexes of inputs we can link to, cached per node. group outputs sockets change as we link, never cached"""
+
+        availsock = self.availsock_cache.get(node.name)
+        if (availsock is None):
+            availsock = [ i for i,s in enumerate(node.inputs) if (s.is_multi_input or len(s.links)==0) and s.enabled]
+            if (node.type!="GROUP_OUTPUT"):
+                self.availsock_cache[node.name] = availsock
+
+        return availsock
+
     def modal(self, context, event):     
         """main state machine"""
 
@@ -687,21 +1938,33 @@ class NOODLER_OT_draw_route(bpy.types.Operator):
                 else:
                     self.backstep(context)
 
-            if self.out_link:
-                #remove created link from previous shift loop
-                self.node_tree.links.remove(self.out_link)
-                self.out_link = None
+                #the preview reroute is gone too
+                if (self.preview is not None):
+                    self.preview_loc = None
+                    self.preview.lines.clear()
+                    self.preview.points.clear()
 
-            #always reset selection
-            set_all_node_select(self.node_tree.nodes,False)
+            #get nearest node, only if cursor left the current target node
+            ensure_mouse_cursor(context, event)
+            cursor = context.space_data.cursor_location
+            if (self.nearest is None) or (not self.is_in_target(cursor)):
+                nearest = get_node_at_pos(self.node_tree.nodes, context, event, position=cursor, forbidden=[self.from_active]+self.created_rr,)
+                if (nearest is None):
+                    return {'RUNNING_MODAL'}
+            else: nearest = self.nearest
 
-            #get nearest node
-            ensure_mouse_cursor(context, event)                
-            nearest = get_node_at_pos(self.node_tree.nodes, context, event, position=context.space_data.cursor_location, forbidden=[self.from_active]+self.created_rr,)
+            is_wheel = event.type in ("WHEELUPMOUSE","WHEELDOWNMOUSE")
 
             #if switched to a new nearest node:
             if self.nearest != nearest:
+
+                if self.out_link:
+                    #remove created link from previous target
+                    self.node_tree.links.remove(self.out_link)
+                    self.out_link = None
+
                 self.nearest = nearest
+                self.nearest_rect = self.get_target_rect(nearest)
 
                 #reset wheel loop
                 self.wheel_out = 0
@@ -712,42 +1975,56 @@ class NOODLER_OT_draw_route(bpy.types.Operator):
                         self.node_tree.outputs.remove(self.node_tree.outputs[-1])
                     self.gr_out_init_len = None 
 
-            #find available sockets
-            availsock = [ i for i,s in enumerate(nearest.inputs) if (s.is_multi_input or len(s.links)==0) and s.enabled]
-            socklen = len(availsock)
-            if (socklen==0):
-                return {'RUNNING_MODAL'}
+                #reset selection for visual cue
+                set_all_node_select(self.node_tree.nodes,False)
+                self.node_tree.nodes.active = nearest
+                nearest.select = True
+
+            #switching socket? remove link created on previous one
+            elif is_wheel and self.out_link:
+                self.node_tree.links.remove(self.out_link)
+                self.out_link = None
+
+            #link only if target or socket changed
+            if (self.out_link is None):
 
-            #use wheel to loop to other sockets
-            if (event.type=="WHEELDOWNMOUSE"): self.wheel_out = 0 if (self.wheel_out>=socklen-1) else self.wheel_out+1
-            elif (event.type=="WHEELUPMOUSE"): self.wheel_out = socklen-1 if (self.wheel_out<=0) else self.wheel_out-1
+                #find available sockets
+                availsock = self.get_available_sockets(nearest)
+                socklen = len(availsock)
+                if (socklen==0):
+                    return {'RUNNING_MODAL'}
 
-            #reset selection for visual cue
-            self.node_tree.nodes.active = nearest
-            nearest.select = True
+                #use wheel to loop to other sockets
+                if (event.type=="WHEELDOWNMOUSE"): self.wheel_out = 0 if (self.wheel_out>=socklen-1) else self.wheel_out+1
+                elif (event.type=="WHEELUPMOUSE"): self.wheel_out = socklen-1 if (self.wheel_out<=0) else self.wheel_out-1
+                self.wheel_out = min(self.wheel_out, socklen-1)
 
-            #find out sockets
-            outp = nearest.inputs[availsock[self.wheel_out]]
-            #find input socket, depends if user using initially reroute or active
-            if (self.new_rr is not None):
-                  inp = self.new_rr.outputs[0] 
-            else: inp = self.from_active.outputs[self.wheel_inp]
+                #find out sockets
+                outp = nearest.inputs[availsock[self.wheel_out]]
+                #find input socket, depends if user using initially reroute or active
+                if (self.new_rr is not None):
+                      inp = self.new_rr.outputs[0] 
+                else: inp = self.from_active.outputs[self.wheel_inp]
 
-            #keep track if we created new sockets of an GROUP_OUTPUT type
-            if (nearest.type=="GROUP_OUTPUT"):
-                if self.gr_out_init_len is None:
-                    self.gr_out_init_len = len([s for s in nearest.inputs if s.type!="CUSTOM"])
+                #keep track if we created new sockets of an GROUP_OUTPUT type
+                if (nearest.type=="GROUP_OUTPUT"):
+                    if self.gr_out_init_len is None:
+                        self.gr_out_init_len = len([s for s in nearest.inputs if s.type!="CUSTOM"])
 
-            #create the link
-            out_link = self.node_tree.links.new(inp, outp,)
+                #create the link
+                out_link = self.node_tree.links.new(inp, outp,)
 
-            #detect if we created a new group output by doing this check
-            if (out_link!=self.node_tree.links[-1]):
-                  self.out_link = self.node_tree.links[-1] #forced to do so, creating link to output type is an illusion, two links are created in this special case
-            else: self.out_link = out_link
+                #detect if we created a new group output by doing this check
+                if (out_link!=self.node_tree.links[-1]):
+                      self.out_link = self.node_tree.links[-1] #forced to do so, creating link to output type is an illusion, two links are created in this special case
+                else: self.out_link = out_link
 
             if (event.type=="RET") or ((event.type=="LEFTMOUSE") and (event.value=="PRESS")):
 
+                #alt? let noodler find the way around nodes
+                if event.alt and (self.out_link is not None):
+                    auto_route_links(self.node_tree, [self.out_link])
+
                 bpy.ops.ed.undo_push(message="Route Drawing", )
                 self.bfl_message(mode="clear")
 
@@ -765,8 +2042,10 @@ class NOODLER_OT_draw_route(bpy.types.Operator):
                 self.node_tree.links.remove(self.out_link)
                 self.out_link = None
             
-            #reset wheel loop
+            #reset wheel loop & target
             self.wheel_out = 0
+            self.nearest = self.nearest_rect = None
+            self.availsock_cache.clear()
 
             #if we created new slots in group output, reset
             if (self.gr_out_init_len is not None):
@@ -833,10 +2112,12 @@ class NOODLER_OT_draw_route(bpy.types.Operator):
                 self.node_tree.nodes.remove(n)
 
             #reset selection to init
-            set_all_node_select(self.node_tree.nodes,False)
             if self.from_active:
                 self.node_tree.nodes.active = self.from_active
-                self.from_active.select = True
+            if not restore_node_select(self.node_tree.nodes, self.init_select):
+                set_all_node_select(self.node_tree.nodes,False)
+                if self.from_active:
+                    self.from_active.select = True
 
             self.bfl_message(mode="clear")
 
@@ -853,12 +2134,257 @@ class NOODLER_OT_draw_route(bpy.types.Operator):
                   cursor.x = self.last_click.x
             else: cursor.y = self.last_click.y
 
+        #deferred? only move the preview
+        if (self.preview is not None):
+            self.preview_loc = cursor.copy()
+            self.preview.lines[:] = [[self.last_click[:], cursor[:]]]
+            self.preview.points[:] = [cursor[:]]
+            return {'RUNNING_MODAL'}
+
         rr = self.new_rr
         rr.location = cursor
 
         return {'RUNNING_MODAL'}
 
 
+NODE_DY = 20 #socket row height, U.widget_unit at 1.0 scale
+
+
+def get_socket_location(snap, i, socket):
+    """estimated global location of a socket, there is no api for it. 
+    outputs are stacked under the header, inputs above the bottom border, buttons in between are unknown"""
+
+    x, top = snap.absolute[i].tolist()
+    if snap.is_reroute[i]:
+        return x, top
+
+    w, h = snap.dimensions[i].tolist()
+    node = socket.node
+    sockets = [s for s in (node.outputs if socket.is_output else node.inputs) if s.enabled and (not s.hide)]
+    k = next((k for k,s in enumerate(sockets) if (s==socket)), 0)
+
+    if socket.is_output:
+        return x+w, top-NODE_DY*(1.5+k)
+
+    return x, top-h+NODE_DY*(len(sockets)-k-0.5)
+
+
+def get_segment_distances(px, py, a, b):
+    """distances of the points arrays to the segment a->b"""
+
+    (ax, ay), (bx, by) = a, b
+    dx, dy = bx-ax, by-ay
+    length = dx*dx + dy*dy
+    t = numpy.clip(((px-ax)*dx + (py-ay)*dy)/length, 0, 1) if (length>0) else 0
+
+    return numpy.hypot(px-ax-t*dx, py-ay-t*dy)
+
+
+def find_orthogonal_path(grid, start, end, margin=20, bend=60, padding=200, attempts=3, max_cells=100_000):
+    """A* over a sparse (hanan) grid made from the obstacles edges in a corridor around the straight start->end route. 
+    the path leaves start & reach end going right, bends are penalized. return list of points, None if no path found
+    or if the grid gets larger than max_cells"""
+
+    (sx, sy), (ex, ey) = start, end
+
+    for attempt in range(attempts):
+
+        #search corridor, widened if no path found
+        pad = padding*(2**attempt)
+        rx0, ry0, rx1, ry1 = min(sx,ex)-pad, min(sy,ey)-pad, max(sx,ex)+pad, max(sy,ey)+pad
+
+        #only obstacles near the straight route make grid lines, a long diagonal route would otherwise
+        #build its grid from every node of its bounding box. centers test, padded by the rects half diagonals
+        indexes = [i for i in grid.query(rx0, ry0, rx1, ry1) if (i not in grid.reroutes)]
+        rects = numpy.array([grid.rects[i] for i in indexes], dtype=numpy.float64).reshape(-1,4) + (-margin, -margin, margin, margin)
+        near = get_segment_distances((rects[:,0]+rects[:,2])/2, (rects[:,1]+rects[:,3])/2, start, end) \
+               <= pad + numpy.hypot(rects[:,2]-rects[:,0], rects[:,3]-rects[:,1])/2
+        obstacles = rects[near].tolist()
+
+        #regular lines in the corridor, so free space far from any obstacle is still walkable
+        lines = numpy.arange(rx0, rx1, pad/2).tolist(), numpy.arange(ry0, ry1, pad/2).tolist()
+
+        xs = sorted({rx0, rx1, sx, ex}.union(lines[0], (min(max(v,rx0),rx1) for r in obstacles for v in (r[0],r[2]))))
+        ys = sorted({ry0, ry1, sy, ey}.union(lines[1], (min(max(v,ry0),ry1) for r in obstacles for v in (r[1],r[3]))))
+        nx, ny = len(xs), len(ys)
+
+        #too long to search, a wider attempt would only be larger
+        if ((nx-1)*(ny-1) > max_cells):
+            return None
+
+        #cells leaving the corridor are blocked, they could hide dropped obstacles. 
+        #distance to a segment is convex, the farthest point of a cell is one of its corners
+        corners = get_segment_distances(numpy.array(xs)[:,None], numpy.array(ys)[None,:], start, end) > pad
+        blocked = corners[:-1,:-1] | corners[1:,:-1] | corners[:-1,1:] | corners[1:,1:]
+
+        #cells between grid lines covered by an obstacle
+        for x0, y0, x1, y1 in obstacles:
+            i0, i1 = bisect_left(xs, max(x0,rx0)), bisect_left(xs, min(x1,rx1))
+            j0, j1 = bisect_left(ys, max(y0,ry0)), bisect_left(ys, min(y1,ry1))
+            blocked[i0:i1, j0:j1] = True
+            continue
+        blocked = blocked.tolist()
+
+        #outside of the region is unknown, region borders are only walkable along free cells
+        def is_blocked(ci, cj):
+            return (not ((0 <= ci < nx-1) and (0 <= cj < ny-1))) or blocked[ci][cj]
+
+        #segments along obstacles borders are free, only crossing an obstacle is forbidden
+        def can_move(i, j, d):
+            if (d<2):
+                ci = i if (d==0) else i-1
+                return not (is_blocked(ci, j-1) and is_blocked(ci, j))
+            cj = j if (d==2) else j-1
+            return not (is_blocked(i-1, cj) and is_blocked(i, cj))
+
+        steps = ((1,0),(-1,0),(0,1),(0,-1)) #right, left, up, down
+        si, sj, ei, ej = xs.index(sx), ys.index(sy), xs.index(ex), ys.index(ey)
+
+        def heuristic(i, j):
+            return abs(xs[i]-ex) + abs(ys[j]-ey)
+
+        state = (si,sj,0)
+        costs = {state:0.0}
+        parents = {state:None}
+        heap = [(heuristic(si,sj), 0.0, state)]
+        found = None
+
+        while heap:
+            _, g, state = heapq.heappop(heap)
+            if (g > costs.get(state, numpy.inf)):
+                continue
+            i, j, d = state
+            if (i==ei) and (j==ej) and (d==0):
+                found = state
+                break
+
+            for nd,(di,dj) in enumerate(steps):
+                #no u-turns
+                if (nd^1)==d:
+                    continue
+                ni, nj = i+di, j+dj
+                if not ((0 <= ni < nx) and (0 <= nj < ny)) or not can_move(i, j, nd):
+                    continue
+                ng = g + abs(xs[ni]-xs[i]) + abs(ys[nj]-ys[j]) + (bend if (nd!=d) else 0)
+                nstate = (ni,nj,nd)
+                if (ng < costs.get(nstate, numpy.inf)):
+                    costs[nstate] = ng
+                    parents[nstate] = state
+                    heapq.heappush(heap, (ng+heuristic(ni,nj), ng, nstate))
+                continue
+            continue
+
+        if (found is None):
+            continue
+
+        path = []
+        while found is not None:
+            path.append((xs[found[0]], ys[found[1]]))
+            found = parents[found]
+            continue
+
+        return path[::-1]
+
+    return None
+
+
+def get_path_corners(points):
+    """points where an orthogonal polyline changes direction"""
+
+    corners = []
+    for a, b, c in zip(points, points[1:], points[2:]):
+        if ((a[0]==b[0])!=(b[0]==c[0])) or ((a[1]==b[1])!=(b[1]==c[1])):
+            corners.append(b)
+        continue
+
+    return corners
+
+
+def auto_route_links(node_tree, links, margin=20, bend=60):
+    """reroute the given links around nodes, all paths use the same spatial grid, reroutes are placed in one batch.
+    return a report of routed links & created reroutes"""
+
+    init_time = datetime.now()
+
+    nodes = node_tree.nodes
+    snap = get_tree_snapshot(nodes)
+    grid = get_node_grid(nodes)
+
+    plans = []
+    for l in links:
+
+        a, b = snap.get_index(l.from_node), snap.get_index(l.to_node)
+        if (a is None) or (b is None):
+            continue
+
+        (sx, sy), (ex, ey) = get_socket_location(snap, a, l.from_socket), get_socket_location(snap, b, l.to_socket)
+
+        #ports on the inflated borders, outside of the obstacles
+        start = (sx+(0 if snap.is_reroute[a] else margin), sy)
+        end = (ex-(0 if snap.is_reroute[b] else margin), ey)
+
+        path = find_orthogonal_path(grid, start, end, margin=margin, bend=bend)
+        if (path is None):
+            continue
+
+        corners = get_path_corners([(sx,sy)] + path + [(ex,ey)])
+        if corners:
+            plans.append((l, l.from_socket, l.to_socket, corners))
+        continue
+
+    report = {"routed":len(plans), "reroutes":sum(len(p[3]) for p in plans), "time":0.0}
+    if (len(plans)==0):
+        report["time"] = (datetime.now()-init_time).total_seconds()
+        return report
+
+    for l, _, _, _ in plans:
+        node_tree.links.remove(l)
+        continue
+
+    #batch creation, new nodes are appended, locations are written at once
+    created = [ [nodes.new("NodeReroute") for _ in corners] for _, _, _, corners in plans ]
+
+    locs = numpy.empty(len(nodes)*2, dtype=numpy.float32)
+    nodes.foreach_get("location", locs)
+    locs[len(nodes)*2-report["reroutes"]*2:] = [v for _, _, _, corners in plans for p in corners for v in p]
+    nodes.foreach_set("location", locs)
+
+    for (_, from_sock, to_sock, _), rrs in zip(plans, created):
+        sockets = [from_sock] + [s for rr in rrs for s in (rr.inputs[0], rr.outputs[0])] + [to_sock]
+        for out, inp in zip(sockets[0::2], sockets[1::2]):
+            node_tree.links.new(out, inp)
+            continue
+        continue
+
+    report["time"] = (datetime.now()-init_time).total_seconds()
+
+    return report
+
+
+class NOODLER_OT_auto_route(bpy.types.Operator): #context from node editor only
+
+    bl_idname      = "noodler.auto_route"
+    bl_label       = "Auto Route Links"
+    bl_description = "Route the links of selected nodes around other nodes with reroutes"
+    bl_options     = {'REGISTER', 'UNDO'}
+
+    margin : bpy.props.FloatProperty(default=20, min=0, name="Margin", description="Distance kept from nodes",)
+    bend : bpy.props.FloatProperty(default=60, min=0, name="Bend Cost", description="Higher values give fewer corners & longer paths",)
+
+    @classmethod
+    def poll(cls, context):
+        return (context.space_data.type=="NODE_EDITOR") and (context.space_data.node_tree is not None)
+
+    def execute(self, context):
+
+        ng , _ = get_active_tree(context)
+        links = [l for l in ng.links if (l.from_node.select or l.to_node.select) and (l.from_node.type!="REROUTE") and (l.to_node.type!="REROUTE")]
+        report = auto_route_links(ng, links, margin=self.margin, bend=self.bend)
+        self.report({"INFO"}, f"Noodler: routed {report['routed']} link(s) with {report['reroutes']} reroute(s), {report['time']:.3f}s")
+
+        return {'FINISHED'}
+
+
 #   .oooooo.   oooo                                     .o88o.
 #  d8P'  `Y8b  `888                                     888 `"
 # 888           888 .oo.    .oooo.   ooo. .oo.  .oo.   o888oo   .ooooo.  oooo d8b
@@ -916,6 +2442,7 @@ class ChamferItem():
     init_rr = "" #Initial Reroute Node. Storing names to avoid crash
     init_loc_local = (0,0) #Initial Local Location Vector.
     added_rr = "" #all added reroute, aka the reroute added before init rr. Storing names to avoid crash
+    init_loc_global = (0,0) #Initial Global Location Vector, for previews.
     fromvec = (0,0) #downstream chamfer direction Vector
     tovec = (0,0) #upstream chamfer direction  Vector
 
@@ -935,12 +2462,27 @@ class NOODLER_OT_chamfer(bpy.types.Operator):
         self.init_click = (0,0)
         self.chamfer_data = []
         self.init_state = {}
+        self.init_select = None #selection bitset before invoke
+
+        #compact chamfer state, packed once setup is done
+        self.buffer = None #all nodes locations, flat array read & written in bulk
+        self.locations = None #(N,2) view of the buffer
+        self.init_idx = None #init reroutes node indexes
+        self.added_idx = None #added reroutes node indexes
+        self.init_locs = None #(K,2) initial local locations
+        self.fromvecs = None #(K,2) downstream chamfer directions
+        self.tovecs = None #(K,2) upstream chamfer directions
+
+        #deferred preview, reroutes are only created on confirm
+        self.preview = None
+        self.distance = 0
 
     @classmethod
     def poll(cls, context):        
         return (context.space_data.type=="NODE_EDITOR") and (context.space_data.node_tree is not None)
 
-    def chamfer_setup(self, n):
+    def chamfer_directions(self, n):
+        """read only part of the setup, get chamfer directions without touching the nodetree"""
 
         ng = self.node_tree
 
@@ -950,13 +2492,11 @@ class NOODLER_OT_chamfer(bpy.types.Operator):
         #get initial node location
         Chamf.init_loc_local = n.location.copy() 
 
-        left_link = n.inputs[0].links[0]
-        from_sock = left_link.from_socket
-        right_link = n.outputs[0].links[0]
-        to_sock = right_link.to_socket
+        from_sock = n.inputs[0].links[0].from_socket
+        to_sock = n.outputs[0].links[0].to_socket
 
         #get chamfer directions, in global space
-        loc_init_global = get_node_location(n, ng.nodes).copy() 
+        loc_init_global = Chamf.init_loc_global = get_node_location(n, ng.nodes).copy() 
         #get chamfer direction from
         if (from_sock.node.type=="REROUTE"):
               Chamf.fromvec = get_node_location(from_sock.node, ng.nodes) - loc_init_global
@@ -968,6 +2508,17 @@ class NOODLER_OT_chamfer(bpy.types.Operator):
               Chamf.tovec.normalize()
         else: Chamf.tovec = Vector((1,0))
 
+        self.chamfer_data.append(Chamf)
+        return None
+
+    def chamfer_setup(self, Chamf):
+
+        ng = self.node_tree
+        n = ng.nodes[Chamf.init_rr]
+
+        left_link = n.inputs[0].links[0]
+        from_sock = left_link.from_socket
+
         #add new reroute 
         rra = ng.nodes.new("NodeReroute")
         rra.location = n.location
@@ -983,7 +2534,6 @@ class NOODLER_OT_chamfer(bpy.types.Operator):
         #set selection visual cue 
         n.select = rra.select = True 
 
-        self.chamfer_data.append(Chamf)
         return None
 
     def invoke(self, context, event):
@@ -999,22 +2549,65 @@ class NOODLER_OT_chamfer(bpy.types.Operator):
         if (len(selected)==0):
             return {'FINISHED'}
 
+        #global locations needed for chamfer directions
+        get_frame_offsets(ng.nodes, refresh=True)
+
         #save state to data later
+        self.init_select = save_node_select(ng.nodes)
         for n in selected: 
             self.init_state[n.name]={"location":n.location.copy(),"IN":get_rr_links_info(n,"IN"),"OUT":get_rr_links_info(n,"OUT")}
 
-        #set selection
-        set_all_node_select(self.node_tree.nodes,False)
-
-        #set up chamfer
         for n in selected:
-            self.chamfer_setup(n)
+            self.chamfer_directions(n)
+
+        #deferred? nothing is written until confirm
+        if is_deferred_preview():
+            self.preview = PreviewModel()
+            self.preview.show()
+            context.window_manager.modal_handler_add(self)
+            return {'RUNNING_MODAL'}
+
+        self.setup_all()
 
         #start modal 
         context.window_manager.modal_handler_add(self)
 
         return {'RUNNING_MODAL'}
 
+    def setup_all(self):
+        """create all chamfer reroutes & links"""
+
+        #set selection
+        set_all_node_select(self.node_tree.nodes,False)
+
+        #set up chamfer
+        for Chamf in self.chamfer_data:
+            self.chamfer_setup(Chamf)
+
+        self.pack_chamfer_data()
+
+        return None
+
+    def move_all(self, distance):
+        """move chamfer vertex, all at once. locations are read again first, nodes we don't own are written back untouched"""
+
+        nodes = self.node_tree.nodes
+        nodes.foreach_get("location", self.buffer)
+        self.locations[self.init_idx] = self.init_locs + ( self.tovecs * distance ) #need global to local
+        self.locations[self.added_idx] = self.init_locs + ( self.fromvecs * distance ) #need global to local
+        nodes.foreach_set("location", self.buffer)
+
+        return None
+
+    def update_preview(self):
+        """chamfer polylines, in global space"""
+
+        d = self.distance
+        self.preview.lines[:] = [ [ (c.init_loc_global + c.fromvec*d)[:], (c.init_loc_global + c.tovec*d)[:] ] for c in self.chamfer_data ]
+        self.preview.points[:] = [ p for line in self.preview.lines for p in line ]
+
+        return None
+
     def modal(self, context, event):     
 
         context.area.tag_redraw()
@@ -1022,12 +2615,25 @@ class NOODLER_OT_chamfer(bpy.types.Operator):
         #if user confirm:
 
         if (event.type in ("LEFTMOUSE","RET","SPACE")):
+
+            #deferred? write everything at once
+            if (self.preview is not None):
+                self.preview.hide()
+                self.setup_all()
+                self.move_all(self.distance)
+
             bpy.ops.ed.undo_push(message="Reroute Chamfer", )
             return {'FINISHED'}
 
         #if user cancel:
 
         elif event.type in ("ESC","RIGHTMOUSE"):
+
+            #deferred? nothing to restore
+            if (self.preview is not None):
+                self.preview.hide()
+                context.area.tag_redraw()
+                return {'CANCELLED'}
              
             #remove all newly created items
             for Chamfer in self.chamfer_data:
@@ -1041,75 +2647,435 @@ class NOODLER_OT_chamfer(bpy.types.Operator):
                 restore_links(n, self.node_tree, v["OUT"], "OUT")
                 continue
 
-            context.area.tag_redraw()
-            return {'CANCELLED'}
+            restore_node_select(self.node_tree.nodes, self.init_select)
+
+            context.area.tag_redraw()
+            return {'CANCELLED'}
+
+        #else move position of all chamfer items
+        
+        #get distance data from cursor
+        ensure_mouse_cursor(context, event)
+        cursor = context.space_data.cursor_location
+        self.distance = hypot(cursor.x-self.init_click.x, cursor.y-self.init_click.y)
+
+        if (self.preview is not None):
+              self.update_preview()
+        else: self.move_all(self.distance)
+
+        return {'RUNNING_MODAL'}
+
+    def pack_chamfer_data(self):
+        """store chamfer items in arrays with resolved node indexes, so modal only does one vectorized computation & one bulk write"""
+
+        nodes = self.node_tree.nodes
+        index = {n.name:i for i,n in enumerate(nodes)}
+
+        self.init_idx = numpy.array([index[c.init_rr] for c in self.chamfer_data], dtype=numpy.int64)
+        self.added_idx = numpy.array([index[c.added_rr] for c in self.chamfer_data], dtype=numpy.int64)
+        self.init_locs = numpy.array([c.init_loc_local[:] for c in self.chamfer_data], dtype=numpy.float32)
+        self.fromvecs = numpy.array([c.fromvec[:] for c in self.chamfer_data], dtype=numpy.float32)
+        self.tovecs = numpy.array([c.tovec[:] for c in self.chamfer_data], dtype=numpy.float32)
+
+        self.buffer = numpy.empty(len(nodes)*2, dtype=numpy.float32)
+        self.locations = self.buffer.reshape(len(nodes),2)
+
+        return None
+
+
+def is_collinear(a, b, c, tolerance=2):
+    """is point b on the segment a->c, a reroute there draws no visible corner"""
+
+    abx, aby, acx, acy = b[0]-a[0], b[1]-a[1], c[0]-a[0], c[1]-a[1]
+    length = hypot(acx, acy)
+    if (length<=tolerance):
+        return False
+
+    #distance to the line & projection inside the segment, a reroute going backward is a corner
+    return (abs(abx*acy-aby*acx)/length <= tolerance) and (0 <= (abx*acx+aby*acy)/length <= length)
+
+
+def simplify_reroutes(node_tree, collinear=True, zero_length=True, dangling=True, passthrough=True, selected_only=False, tolerance=2, dry_run=False):
+    """remove redundant reroutes & relink through them, visible corners & ★ favorites are kept.
+    works on the adjacency & geometry snapshots, each reroute is visited a constant number of times.
+    return a report of removed nodes & links"""
+
+    init_time = datetime.now()
+
+    #python lists, links/nodes collections lookups by index are not constant time
+    nodes, links = node_tree.nodes, list(node_tree.links)
+    snap = get_tree_snapshot(nodes)
+    pos = snap.absolute.tolist()
+
+    report = {"nodes_removed":0, "links_removed":0, "analysis_time":0}
+
+    #adjacency of reroutes, as link indexes
+    link_from = [snap.get_index(l.from_node) for l in links]
+    link_to = [snap.get_index(l.to_node) for l in links]
+    if (None in link_from) or (None in link_to):
+        return report
+
+    up = {} #reroute -> incoming link
+    down = {} #reroute -> outgoing links
+    for k,(a,b) in enumerate(zip(link_from, link_to)):
+        if snap.is_reroute[b]:
+            up[b] = k
+        if snap.is_reroute[a]:
+            down.setdefault(a,[]).append(k)
+        continue
+
+    select = get_node_select(nodes) if selected_only else None
+    candidates = {i for i in numpy.flatnonzero(snap.is_reroute).tolist() if (not snap.names[i].startswith("★")) and ((select is None) or select[i])}
+
+    removed = set()
+
+    def alive_children(i):
+        return [link_to[k] for k in down.get(i,[]) if (link_to[k] not in removed)]
+
+    def has_input(i):
+        return (i in up) and (link_from[up[i]] not in removed)
+
+    #dangling reroutes, removing one can make its neighbors reroutes dangling too
+    if dangling:
+        queue = deque(i for i in candidates if (i not in up) or (len(down.get(i,[]))==0))
+        while queue:
+            i = queue.popleft()
+            if (i in removed) or (has_input(i) and alive_children(i)):
+                continue
+            removed.add(i)
+            queue += [j for j in alive_children(i) if (j in candidates)]
+            if (i in up) and (link_from[up[i]] in candidates):
+                queue.append(link_from[up[i]])
+            continue
+
+    #collinear & zero length, walking chains from upstream, anchor is the last kept reroute
+    if (collinear or zero_length):
+
+        heads = [i for i in numpy.flatnonzero(snap.is_reroute).tolist() if (i not in removed) and not (has_input(i) and snap.is_reroute[link_from[up[i]]])]
+        stack = [(i,None) for i in heads]
+        visited = set()
+
+        while stack:
+            i, anchor = stack.pop()
+            if (i in visited):
+                continue
+            visited.add(i)
+
+            children = alive_children(i)
+            if (anchor is not None) and (i in candidates):
+                if zero_length and (hypot(pos[i][0]-pos[anchor][0], pos[i][1]-pos[anchor][1]) <= tolerance):
+                    removed.add(i)
+                elif collinear and (len(children)==1) and snap.is_reroute[children[0]] and is_collinear(pos[anchor], pos[i], pos[children[0]], tolerance):
+                    removed.add(i)
+
+            keep = i if (i not in removed) else anchor
+            stack += [(c,keep) for c in children if snap.is_reroute[c]]
+            continue
+
+    #pass-through chains, straight horizontal chains of single reroutes between two nodes, 
+    #level with both the source output & the target input sockets, otherwise they draw corners.
+    #the collinear pass removed reroutes inside chains, adjacency looks through them
+    if passthrough:
+
+        through = {} #removed reroute -> links to the alive nodes it feeds
+        def get_through(j):
+            stack = [j]
+            while stack:
+                x = stack[-1]
+                pending = [link_to[k] for k in down.get(x,[]) if (link_to[k] in removed) and (link_to[k] not in through)]
+                if pending:
+                    stack += pending
+                    continue
+                through[x] = [y for k in down.get(x,[]) for y in (through[link_to[k]] if (link_to[k] in removed) else (k,))]
+                stack.pop()
+                continue
+            return through[j]
+
+        def get_alive_links(i):
+            return [y for k in down.get(i,[]) for y in (get_through(link_to[k]) if (link_to[k] in removed) else (k,))]
+
+        sources = {} #removed reroute -> (alive node, link) feeding it, None if the chain had no input
+        def get_alive_source(i):
+            chain = []
+            k = up.get(i)
+            while (k is not None) and (link_from[k] in removed) and (link_from[k] not in sources):
+                chain.append(link_from[k])
+                k = up.get(link_from[k])
+                continue
+            if (k is None):
+                  result = None
+            elif (link_from[k] in sources):
+                  result = sources[link_from[k]]
+            else: result = (link_from[k], k)
+            for x in chain:
+                sources[x] = result
+                continue
+            return result
+
+        heads = []
+        for i in candidates:
+            if (i in removed):
+                continue
+            src = get_alive_source(i)
+            if (src is not None) and not snap.is_reroute[src[0]]:
+                heads.append((i,src))
+            continue
+
+        for i, (a, ka) in heads:
+            chain = [i]
+            while True:
+                outs = get_alive_links(chain[-1])
+                if (len(outs)!=1) or (not snap.is_reroute[link_to[outs[0]]]):
+                    break
+                chain.append(link_to[outs[0]])
+                continue
+            ends_on_node = (len(outs)==1) and (not snap.is_reroute[link_to[outs[0]]])
+            if (not ends_on_node) or (not all(j in candidates for j in chain)):
+                continue
+            kb = outs[0]
+            ys = [pos[j][1] for j in chain]
+            ys.append(get_socket_location(snap, a, links[ka].from_socket)[1])
+            ys.append(get_socket_location(snap, link_to[kb], links[kb].to_socket)[1])
+            if (max(ys)-min(ys) <= tolerance):
+                removed.update(chain)
+            continue
+
+    #new links, from the first alive upstream socket of removed chains
+    source = {} #removed reroute -> alive output socket feeding it, None if the chain had no input
+
+    def get_source(i):
+
+        chain = []
+        while (i is not None) and (i in removed) and (i not in source):
+            chain.append(i)
+            i = link_from[up[i]] if (i in up) else None
+            continue
+
+        if (i is None):
+              result = None
+        elif (i in source):
+              result = source[i]
+        else: result = links[up[chain[-1]]].from_socket
+
+        for j in chain:
+            source[j] = result
+            continue
+
+        return result
+
+    relinks = []
+    for k,(a,b) in enumerate(zip(link_from, link_to)):
+        if (a in removed) and (b not in removed):
+            sock = get_source(a)
+            if (sock is not None):
+                relinks.append((sock, links[k].to_socket))
+        continue
+
+    report = {
+        "nodes_removed":len(removed),
+        "links_removed":sum(1 for a,b in zip(link_from,link_to) if (a in removed) or (b in removed)) - len(relinks),
+        "analysis_time":(datetime.now()-init_time).total_seconds(),
+        }
+
+    if dry_run or (len(removed)==0):
+        return report
+
+    #batch write, sockets resolved before any removal
+    dead = [n for i,n in enumerate(nodes) if (i in removed)]
+    for from_sock, to_sock in relinks:
+        node_tree.links.new(from_sock, to_sock)
+        continue
+    for n in dead:
+        nodes.remove(n)
+        continue
+
+    return report
+
+
+class NOODLER_OT_simplify_reroutes(bpy.types.Operator): #context from node editor only
+
+    bl_idname      = "noodler.simplify_reroutes"
+    bl_label       = "Simplify Reroutes"
+    bl_description = "Remove redundant reroutes, keeping visible corners & favorites"
+    bl_options     = {'REGISTER', 'UNDO'}
+
+    collinear : bpy.props.BoolProperty(default=True, name="Collinear", description="Remove reroutes lying on a straight wire",)
+    zero_length : bpy.props.BoolProperty(default=True, name="Overlapping", description="Remove reroutes placed on the previous one",)
+    dangling : bpy.props.BoolProperty(default=True, name="Dangling", description="Remove reroutes with no input or no output",)
+    passthrough : bpy.props.BoolProperty(default=True, name="Straight Chains", description="Remove horizontal chains of reroutes between two nodes",)
+    selected_only : bpy.props.BoolProperty(default=False, name="Selected Only",)
+    tolerance : bpy.props.FloatProperty(default=2, min=0, name="Tolerance",)
+
+    @classmethod
+    def poll(cls, context):
+        return (context.space_data.type=="NODE_EDITOR") and (context.space_data.node_tree is not None)
+
+    def execute(self, context):
+
+        ng , _ = get_active_tree(context)
+        report = simplify_reroutes(ng, collinear=self.collinear, zero_length=self.zero_length, dangling=self.dangling, passthrough=self.passthrough, selected_only=self.selected_only, tolerance=self.tolerance,)
+        self.report({"INFO"}, f"Noodler: removed {report['nodes_removed']} reroute(s) & {report['links_removed']} link(s)")
+
+        return {'FINISHED'}
+
+
+# oooooooooo.                                                    .o8
+# `888'   `Y8b                                                  "888
+#  888      888  .ooooo.  oo.ooooo.   .ooooo.  ooo. .oo.    .oooo888   .ooooo.  ooo. .oo.    .ooooo.  oooo    ooo
+#  888      888 d88' `88b  888' `88b d88' `88b `888P"Y88b  d88' `888  d88' `88b `888P"Y88b  d88' `"Y8  `88.  .8'
+#  888      888 888ooo888  888   888 888ooo888  888   888  888   888  888ooo888  888   888  888         `88..8'
+#  888     d88' 888    .o  888   888 888    .o  888   888  888   888  888    .o  888   888  888   .o8    `888'
+# o888bood8P'   `Y8bod8P'  888bod8P' `Y8bod8P' o888o o888o `Y8bod88P" `Y8bod8P' o888o o888o `Y8bod8P'     .8'
+#                          888                                                                        .o..P'
+#                         o888o                                                                       `Y8P'
+
+
+
+def get_csr(a, b, count):
+    """compressed sparse row adjacency from parallel arrays of edges a->b, as python lists for fast iteration"""
+
+    order = numpy.argsort(a, kind="stable")
+    ptr = numpy.zeros(count+1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(a, minlength=count), out=ptr[1:])
+
+    return ptr.tolist(), b[order].tolist()
+
+
+class LinkGraph():
+    """links of a nodetree snapshotted once into CSR adjacency arrays of node indexes,
+    reused until the tree links change. relinks keeping the counts untouched are caught by the depsgraph handler,
+    file loads & undos by clear_tree_caches"""
+
+    def __init__(self, node_tree):
+
+        nodes = node_tree.nodes
+        links = node_tree.links
+
+        self.signature = (len(nodes), len(links))
+        self.names = [n.name for n in nodes]
+        self.types = [n.type for n in nodes]
+        self.index = {name:i for i,name in enumerate(self.names)}
+        self.parents = [self.index[n.parent.name] if (n.parent is not None) else -1 for n in nodes]
+
+        count = len(self.names)
+        src = numpy.array([self.index[l.from_node.name] for l in links], dtype=numpy.int64)
+        dst = numpy.array([self.index[l.to_node.name] for l in links], dtype=numpy.int64)
+
+        self.down_ptr, self.down_idx = get_csr(src, dst, count) #node -> nodes linked to its outputs
+        self.up_ptr, self.up_idx = get_csr(dst, src, count) #node -> nodes linked to its inputs
+
+    def is_valid(self, node_tree):
+        return (len(node_tree.nodes), len(node_tree.links))==self.signature
+
+    def closure(self, starts, mode="upstream or downstream"):
+        """iterative breadth first search from one or many nodes, return list of reached node indexes (starts included)"""
+
+        #mode names kept from original implementation, 'upstream' is following outputs
+        if (mode=="upstream"):
+              ptr, idx = self.down_ptr, self.down_idx
+        else: ptr, idx = self.up_ptr, self.up_idx
+
+        visited = bytearray(len(self.names))
+        queue = deque()
+        for i in starts:
+            if not visited[i]:
+                visited[i] = 1
+                queue.append(i)
+            continue
+        found = []
+
+        while queue:
+            i = queue.popleft()
+            found.append(i)
+            for j in idx[ptr[i]:ptr[i+1]]:
+                if not visited[j]:
+                    visited[j] = 1
+                    queue.append(j)
+                continue
+            continue
+
+        return found
+
+
+LinkGraphs = {}
+
+def get_link_graph(node_tree):
+    """get the adjacency snapshot of a nodetree, rebuilt if links changed"""
+
+    global LinkGraphs
+
+    key = node_tree.as_pointer()
+    graph = LinkGraphs.get(key)
+
+    if (graph is None) or (not graph.is_valid(node_tree)):
+        graph = LinkGraphs[key] = LinkGraph(node_tree)
+
+    return graph
+
+
+def clear_tree_caches():
+    """every cache keyed by nodetree pointers, a pointer could be reused by another tree after a file load or an undo"""
 
-        #else move position of all chamfer items
-        
-        #get distance data from cursor
-        ensure_mouse_cursor(context, event)
-        distance = numpy.linalg.norm(context.space_data.cursor_location - self.init_click)
-            
-        #move chamfer vertex
-        for Chamf in self.chamfer_data:
-            self.node_tree.nodes.get(Chamf.init_rr).location = Chamf.init_loc_local + ( Chamf.tovec * distance ) #need global to local
-            self.node_tree.nodes.get(Chamf.added_rr).location = Chamf.init_loc_local + ( Chamf.fromvec * distance ) #need global to local
-            continue
+    for cache in (NodeSnapshots, NodeGrids, FrameOffsets, LinkGraphs, SearchIndexes, FavoritesFresh):
+        cache.clear()
+    AllTreesSearch.clear()
 
-        return {'RUNNING_MODAL'}
+    return None
 
 
-# oooooooooo.                                                    .o8
-# `888'   `Y8b                                                  "888
-#  888      888  .ooooo.  oo.ooooo.   .ooooo.  ooo. .oo.    .oooo888   .ooooo.  ooo. .oo.    .ooooo.  oooo    ooo
-#  888      888 d88' `88b  888' `88b d88' `88b `888P"Y88b  d88' `888  d88' `88b `888P"Y88b  d88' `"Y8  `88.  .8'
-#  888      888 888ooo888  888   888 888ooo888  888   888  888   888  888ooo888  888   888  888         `88..8'
-#  888     d88' 888    .o  888   888 888    .o  888   888  888   888  888    .o  888   888  888   .o8    `888'
-# o888bood8P'   `Y8bod8P'  888bod8P' `Y8bod8P' o888o o888o `Y8bod88P" `Y8bod8P' o888o o888o `Y8bod8P'     .8'
-#                          888                                                                        .o..P'
-#                         o888o                                                                       `Y8P'
+@bpy.app.handlers.persistent
+def noodler_undo_post(scene,desp):
 
+    clear_tree_caches()
 
+    return None
 
-def get_dependecies(node, context, mode="upstream or downstream", parent=False):
-    """return list of all nodes downstream or upsteam"""
 
-    #determine vars used in recur fct
-    is_upstream = (mode=="upstream")
-    sockets_api = "outputs" if is_upstream else "inputs"
-    link_api = "to_node" if is_upstream else "from_node"
-    nodelist = []
+@bpy.app.handlers.persistent
+def noodler_depsgraph_post(scene,desp):
+    """drop links snapshots of updated trees, mark geometry snapshots stale & mark trees for global search.
+    depsgraph updates are evaluated copies, their pointers never match our original trees keys"""
+
+    if NoodlerProfiler.diagnostics:
+        NoodlerProfiler.record_depsgraph()
+
+    for update in desp.updates:
+        id_data = update.id.original
+        node_tree = id_data if isinstance(id_data, bpy.types.NodeTree) else getattr(id_data, "node_tree", None)
+        if (node_tree is not None):
+            key = node_tree.as_pointer()
+            LinkGraphs.pop(key, None)
+            AllTreesSearch.dirty.add(key)
+            FavoritesFresh.discard(key)
+            #names & parents are only re-read on demand
+            if (key in NodeSnapshots):
+                NodeSnapshots[key].stale = True
+        continue
 
-    def recur_node(node):
-        """gather node in nodelist by recursion"""
+    return None
 
-        #add note to list 
-        nodelist.append(node)
 
-        #frame?
-        if (parent and node.parent):
-            if (node.parent not in nodelist):
-                nodelist.append(node.parent)
+def get_dependecies(node, context, mode="upstream or downstream", parent=False):
+    """return list of all nodes downstream or upsteam"""
 
-        #get sockets 
-        sockets = getattr(node,sockets_api)
-        if not len(sockets):
-            return None 
+    ng = node.id_data
+    nodes = ng.nodes
+    graph = get_link_graph(ng)
 
-        #check all outputs
-        for socket in sockets:
-            for link in socket.links:
-                nextnode = getattr(link,link_api)
-                if nextnode not in nodelist:
-                    recur_node(nextnode)
-                continue
-            continue
-        
-        return None 
+    #node indexes may be outdated if nodes got reordered
+    i = graph.index.get(node.name)
+    if (i is None) or (nodes[i].name!=node.name):
+        graph = LinkGraphs[ng.as_pointer()] = LinkGraph(ng)
+        i = graph.index[node.name]
 
-    recur_node(node)
+    found = graph.closure((i,), mode=mode)
 
-    return nodelist
+    #frame?
+    if parent:
+        found += [p for p in dict.fromkeys(graph.parents[j] for j in found) if (p>=0)]
+        found = list(dict.fromkeys(found))
+
+    return [nodes[j] for j in found]
 
 
 class NOODLER_OT_dependency_select(bpy.types.Operator):
@@ -1134,12 +3100,14 @@ class NOODLER_OT_dependency_select(bpy.types.Operator):
         if node is None:
             return {"CANCELLED"}
 
-        if self.repsel:
-            bpy.ops.node.select_all(action="DESELECT")
+        selection = SelectionTransaction(ng.nodes, clear=self.repsel)
 
         deps = get_dependecies(node, context, mode=self.mode, parent=self.frame)
         for n in deps:
-            n.select = True
+            selection.select(n)
+
+        selection.commit()
+        tag_area_redraw(context.area)
 
         return {"CANCELLED"}
 
@@ -1155,70 +3123,219 @@ class NOODLER_OT_dependency_select(bpy.types.Operator):
 #                                   "Y88888P'
 
 
-def is_node_used(node):
-    """check if node is reaching output"""
-            
-    found_output = False
-    
-    def recur_node(n):
+OUTPUT_TYPES = {
+    "GROUP_OUTPUT",
+    "OUTPUT_MATERIAL", "OUTPUT_WORLD", "OUTPUT_LIGHT", "OUTPUT_AOV", "OUTPUT_LINESTYLE", #shader
+    "COMPOSITE", "VIEWER", "SPLITVIEWER", "OUTPUT_FILE", #compositor
+    "OUTPUT", #texture
+    }
 
-        #reached destination? 
-        if (n.type == "GROUP_OUTPUT"):
-            nonlocal found_output
-            found_output = True
-            return 
 
-        #else continue parcour
-        for out in n.outputs:
-            for link in out.links:
-                recur_node(link.to_node)
+def get_used_nodes(node_group):
+    """indexes of all nodes reaching an output, one reverse traversal from all outputs"""
 
-        return None 
-        
-    recur_node(node)
+    graph = get_link_graph(node_group)
+    outputs = [i for i,t in enumerate(graph.types) if (t in OUTPUT_TYPES)]
 
-    return found_output
+    #'downstream' mode is following inputs
+    return set(graph.closure(outputs, mode="downstream"))
 
 
-def purge_unused_nodes(node_group, delete_muted=True, delete_reroute=True, delete_frame=True):
-    """delete all unused nodes"""
-        
-    for n in list(node_group.nodes):
-        #deselct all
-        n.select = False
+def purge_unused_nodes(node_group, delete_muted=True, delete_reroute=True, delete_frame=True, dry_run=False):
+    """delete all unused nodes, return a report of what is (or would be if dry_run) removed"""
+
+    init_time = datetime.now()
+
+    #never trust a cached graph before deleting user data
+    if (not dry_run):
+        LinkGraphs.pop(node_group.as_pointer(), None)
+
+    nodes = node_group.nodes
+    graph = get_link_graph(node_group)
+    used = get_used_nodes(node_group)
+
+    mute = numpy.empty(len(nodes), dtype=bool)
+    nodes.foreach_get("mute", mute)
+
+    remove = [] #removed directly
+    reconnect = [] #removed while keeping links, with delete_reconnect operator
+
+    for i,t in enumerate(graph.types):
         #delete if muted?
-        if (delete_muted==True and n.mute==True):  
-            n.select = True
+        if (delete_muted==True and mute[i]):
+            reconnect.append(i)
             continue 
         #delete if reroute?
-        if (delete_reroute==True and n.type=="REROUTE"):
-            n.select = True
+        if (delete_reroute==True and t=="REROUTE"):
+            reconnect.append(i)
             continue               
         #don't delete if frame?
-        if (delete_frame==False and n.type=="FRAME"):
+        if (delete_frame==False and t=="FRAME"):
             continue 
         #delete if unconnected
-        if not is_node_used(n):
-            node_group.nodes.remove(n)
+        if (i not in used):
+            remove.append(i)
         continue 
 
-    if delete_muted or delete_reroute:
+    report = {
+        "remove":[graph.names[i] for i in remove],
+        "reconnect":[graph.names[i] for i in reconnect],
+        "analysis_time":(datetime.now()-init_time).total_seconds(),
+        }
+
+    if dry_run:
+        return report
+
+    #select nodes to delete and reconnect, before indexes change
+    selection = SelectionTransaction(nodes, clear=True)
+    selection.wanted[reconnect] = True
+    selection.commit()
+
+    #batch removal, resolved by name
+    for name in report["remove"]:
+        n = nodes.get(name)
+        if (n is not None):
+            nodes.remove(n)
+        continue
+
+    if reconnect:
         bpy.ops.node.delete_reconnect()
         
-    return None 
+    return report
+
+
+def get_layers(graph):
+    """longest path layering, outputs on layer 0. reverse topological order (Kahn), nodes in cycles stay on layer 0"""
 
+    count = len(graph.names)
+    layers = [0]*count
+    outdeg = [graph.down_ptr[i+1]-graph.down_ptr[i] for i in range(count)]
+    queue = deque(i for i in range(count) if (outdeg[i]==0))
 
-def re_arrange_nodes(node_group, Xmultiplier=1):
-    """re-arrange node by sorting them in X location, (could improve)"""
+    while queue:
+        i = queue.popleft()
+        for j in graph.up_idx[graph.up_ptr[i]:graph.up_ptr[i+1]]:
+            if (layers[j] < layers[i]+1):
+                layers[j] = layers[i]+1
+            outdeg[j] -= 1
+            if (outdeg[j]==0):
+                queue.append(j)
+            continue
+        continue
 
-    nodes = { n.location.x:n for n in node_group.nodes }
-    nodes = { k:nodes[k] for k in sorted(nodes) }
+    return layers
 
-    for i,n in enumerate(nodes.values()):
-        n.location.x = i*200*Xmultiplier
-        n.width = 150
 
-    return None 
+def reduce_crossings(graph, layers, order, iterations=4):
+    """barycentric heuristic, sweep layers back and forth and sort nodes by the mean rank of their neighbours"""
+
+    rank = {}
+    for nodes in order:
+        for r,i in enumerate(nodes):
+            rank[i] = r
+        continue
+
+    sweeps = []
+    for _ in range(iterations):
+        #from outputs, nodes follow their downstream neighbours, then back
+        sweeps.append((range(1, len(order)), graph.down_ptr, graph.down_idx))
+        sweeps.append((range(len(order)-2, -1, -1), graph.up_ptr, graph.up_idx))
+
+    for layer_range, ptr, idx in sweeps:
+        for l in layer_range:
+
+            def barycenter(i):
+                neighbours = idx[ptr[i]:ptr[i+1]]
+                if not neighbours:
+                    return rank[i]
+                return sum(rank[j] for j in neighbours)/len(neighbours)
+
+            order[l] = sorted(order[l], key=barycenter)
+            for r,i in enumerate(order[l]):
+                rank[i] = r
+            continue
+
+    return order
+
+
+def layout_nodes(node_tree, spacing_x=80, spacing_y=40, iterations=4):
+    """layered DAG auto-layout: longest-path layering, barycentric crossing reduction, dimension-aware spacing.
+    works on the geometry snapshot and write all locations back in one bulk pass"""
+
+    nodes = node_tree.nodes
+    graph = get_link_graph(node_tree)
+    snap = get_tree_snapshot(nodes)
+
+    if (snap.count==0) or (snap.count!=len(graph.names)):
+        return None
+
+    #not drawn yet nodes have no dimensions
+    dims = snap.dimensions.copy()
+    dims[dims[:,0]<=0,0] = 140
+    dims[dims[:,1]<=0,1] = 100
+
+    #frames are not laid out, they will follow their content
+    layers = get_layers(graph)
+    movable = numpy.flatnonzero(~snap.is_frame).tolist()
+
+    layer_count = max(layers[i] for i in movable)+1 if movable else 0
+    order = [[] for _ in range(layer_count)]
+    for i in sorted(movable, key=lambda i: -snap.absolute[i,1]): #initial order from current height
+        order[layers[i]].append(i)
+
+    order = reduce_crossings(graph, layers, order, iterations=iterations)
+
+    absolute = snap.absolute.copy()
+
+    #columns from right to left, as wide as their widest node
+    x = 0.0
+    for nodes_in_layer in order:
+        if not nodes_in_layer:
+            continue
+        width = float(dims[nodes_in_layer,0].max())
+        x -= width
+        heights = dims[nodes_in_layer,1]
+        y = float(heights.sum() + spacing_y*(len(nodes_in_layer)-1))/2
+        for i,h in zip(nodes_in_layer, heights.tolist()):
+            absolute[i] = (x, y)
+            y -= h + spacing_y
+            continue
+        x -= spacing_x
+        continue
+
+    #back to local space for nodes inside frames
+    locs = snap.locations.copy()
+    parents = snap.parents[movable]
+    offsets = numpy.where(parents[:,None]>=0, snap.absolute[numpy.maximum(parents,0)], 0)
+    locs[movable] = absolute[movable] - offsets
+
+    nodes.foreach_set("location", locs.ravel())
+    invalidate_frame_offsets(nodes)
+
+    return None
+
+
+class NOODLER_OT_node_auto_layout(bpy.types.Operator): #context from node editor only
+
+    bl_idname      = "noodler.node_auto_layout"
+    bl_label       = "Auto Layout Nodes"
+    bl_description = "Arrange nodes in layers following their links"
+    bl_options     = {'REGISTER', 'UNDO'}
+
+    spacing_x  : bpy.props.FloatProperty(default=80, min=0, name="Horizontal Spacing",)
+    spacing_y  : bpy.props.FloatProperty(default=40, min=0, name="Vertical Spacing",)
+    iterations : bpy.props.IntProperty(default=4, min=0, max=20, name="Crossing Reduction Passes",)
+
+    @classmethod
+    def poll(cls, context):
+        return (context.space_data.type=="NODE_EDITOR") and (context.space_data.node_tree is not None)
+
+    def execute(self, context):
+
+        ng , _ = get_active_tree(context)
+        layout_nodes(ng, spacing_x=self.spacing_x, spacing_y=self.spacing_y, iterations=self.iterations)
+
+        return {'FINISHED'}
 
 
 class NOODLER_OT_node_purge_unused(bpy.types.Operator): #context from node editor only
@@ -1235,18 +3352,32 @@ class NOODLER_OT_node_purge_unused(bpy.types.Operator): #context from node edito
     re_arrange : bpy.props.BoolProperty(default=False, name="Re-Arrange Nodes",)
     re_arrange_fake : bpy.props.BoolProperty(default=False, name="Re-Arrange (not possible with frames)",)
 
+    dry_run : bpy.props.BoolProperty(default=False, name="Dry Run", description="Only report what would be removed",)
+
     def execute(self, context):
         node_group = context.space_data.node_tree
 
-        purge_unused_nodes(
+        report = purge_unused_nodes(
             node_group, 
             delete_muted=self.delete_muted,
             delete_reroute=self.delete_reroute,
             delete_frame=self.delete_frame,
+            dry_run=self.dry_run,
             )
 
+        removed = len(report["remove"])+len(report["reconnect"])
+        verb = "would be removed" if self.dry_run else "removed"
+        msg = f"{removed} node(s) {verb}, analysis took {report['analysis_time']*1000:.1f}ms"
+        self.report({'INFO'}, msg)
+
+        if self.dry_run:
+            popup_menu([msg, *report["remove"], *report["reconnect"]][:30], "Purge Dry Run", "INFO")
+            return {'FINISHED'}
+
         if (self.re_arrange and self.delete_frame):
-            re_arrange_nodes(node_group)
+            layout_nodes(node_group)
+
+        tag_area_redraw(context.area)
 
         return {'FINISHED'}
 
@@ -1260,6 +3391,7 @@ class NOODLER_OT_node_purge_unused(bpy.types.Operator): #context from node edito
         layout.prop(self, "delete_muted")
         layout.prop(self, "delete_reroute")
         layout.prop(self, "delete_frame")
+        layout.prop(self, "dry_run")
         
         #Re-Arrange
         if self.delete_frame==True:    
@@ -1309,9 +3441,19 @@ class NOODLER_PT_tool_search(bpy.types.Panel):
         layout.prop(noodle_scn,"search_names")
         layout.prop(noodle_scn,"search_input_only")
         layout.prop(noodle_scn,"search_frame_only")
+        layout.prop(noodle_scn,"search_limit")
+        layout.prop(noodle_scn,"search_global")
+
+        layout.use_property_split = False
 
         s = layout.column()
         s.label(text=f"Found {noodle_scn.search_found} Element(s)")
+
+        if len(noodle_scn.search_results):
+            s.template_list("UI_UL_list", "NOODLER_search_results", noodle_scn, "search_results", noodle_scn, "search_result_index", rows=5)
+            row = s.row(align=True)
+            row.operator("noodler.search_jump",text="Previous",icon="TRIA_UP").direction = "previous"
+            row.operator("noodler.search_jump",text="Next",icon="TRIA_DOWN").direction = "next"
     
         return None 
 
@@ -1359,6 +3501,52 @@ class NOODLER_PT_tool_color_palette(bpy.types.Panel,BrushPanel):
         return None 
 
 
+class NOODLER_UL_color_rules(bpy.types.UIList):
+
+    def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
+
+        row = layout.row(align=True)
+        row.prop(item, "field", text="")
+        row.prop(item, "pattern", text="")
+        row.prop(item, "target", text="")
+        row.prop(item, "color", text="")
+
+        return None 
+
+
+class NOODLER_PT_color_rules(bpy.types.Panel):
+
+    bl_idname = "NOODLER_PT_color_rules"
+    bl_label = "Color Rules"
+    bl_category = "Noolder"
+    bl_space_type = "NODE_EDITOR"
+    bl_region_type = "UI"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    def draw(self, context):
+
+        layout = self.layout
+        noodle_scn = context.scene.noodler
+
+        row = layout.row()
+        row.template_list("NOODLER_UL_color_rules", "", noodle_scn, "color_rules", noodle_scn, "color_rules_index", rows=4)
+
+        col = row.column(align=True)
+        col.operator("noodler.color_rule_edit", text="", icon="ADD").action = "ADD"
+        col.operator("noodler.color_rule_edit", text="", icon="REMOVE").action = "REMOVE"
+        col.separator()
+        col.operator("noodler.color_rule_edit", text="", icon="TRIA_UP").action = "UP"
+        col.operator("noodler.color_rule_edit", text="", icon="TRIA_DOWN").action = "DOWN"
+
+        col = layout.column(align=True)
+        col.label(text="Apply to:")
+        col.operator("noodler.apply_color_rules", text="Active Tree", icon="NODETREE").scope = "ACTIVE"
+        col.operator("noodler.apply_color_rules", text="Selected Materials", icon="MATERIAL").scope = "SELECTED"
+        col.operator("noodler.apply_color_rules", text="Whole File", icon="FILE_BLEND").scope = "FILE"
+
+        return None 
+
+
 class NOODLER_PT_tool_frame(bpy.types.Panel):
 
     bl_idname = "NOODLER_PT_tool_frame"
@@ -1389,10 +3577,21 @@ class NOODLER_PT_tool_frame(bpy.types.Panel):
 class NOODLER_PF_node_framer(bpy.types.AddonPreferences):
     bl_idname = __name__
 
+    deferred_preview : bpy.props.BoolProperty(default=False, name="Deferred Preview", description="Draw Frame, Draw Route & Chamfer only draw a preview while dragging, the nodetree is written once on confirm. Faster on heavy nodetrees",)
+    profiling : bpy.props.BoolProperty(default=False, name="Profiling", description="Record timings of all Noodler operators & updates, displayed in the Noodler sidebar", update=profiling_upd,)
+    diagnostics : bpy.props.BoolProperty(default=False, name="Count Writes", description="Also count nodetree properties changed by each profiled call & the depsgraph updates following them. Slows down every call", update=profiling_upd,)
+
     def draw(self, context):
 
         layout = self.layout
 
+        box = layout.box()
+        box.prop(self, "deferred_preview")
+        box.prop(self, "profiling")
+        row = box.row()
+        row.active = self.profiling
+        row.prop(self, "diagnostics")
+
         kc = bpy.context.window_manager.keyconfigs.addon
 
         #draw shortcuts items:
@@ -1532,6 +3731,55 @@ class NOODLER_PT_shortcuts_memo(bpy.types.Panel):
         return None 
 
 
+class NOODLER_PT_profiler(bpy.types.Panel):
+
+    bl_idname = "NOODLER_PT_profiler"
+    bl_label = "Profiler"
+    bl_category = "Noolder"
+    bl_space_type = "NODE_EDITOR"
+    bl_region_type = "UI"
+
+    @classmethod
+    def poll(cls, context):
+        return is_profiling()
+
+    def draw(self, context):
+
+        layout = self.layout
+
+        row = layout.row(align=True)
+        row.operator("noodler.profiler_reset", text="Reset", icon="TRASH")
+        row.operator("noodler.profiler_export", text="Export", icon="EXPORT")
+
+        rows = NoodlerProfiler.get_rows()
+        if (len(rows)==0):
+            layout.label(text="Nothing recorded yet")
+            return None 
+
+        #per callable stats
+        col = layout.column(align=True)
+        for key, stat in rows[:15]:
+            box = col.box()
+            box.label(text=key)
+            box.label(text=f"{stat['calls']} calls  mean {stat['total']/stat['calls']:.2f}ms  max {stat['max']:.2f}ms")
+            if NoodlerProfiler.diagnostics:
+                writes = "  ".join(f"{k}:{v}" for k,v in stat["writes"].items())
+                box.label(text=f"depsgraph:{stat['depsgraph']}  {writes}")
+            #histogram, upper bound ms: count
+            bins = [ f"<{b}:{c}" for b,c in zip(NoodlerProfiler.buckets+("inf",), stat["histogram"]) if c ]
+            box.label(text=" ".join(bins))
+            continue
+
+        #slowest calls
+        layout.label(text="Slowest Calls:")
+        col = layout.column(align=True)
+        for ms, _, key in NoodlerProfiler.get_slowest()[:10]:
+            col.label(text=f"{ms:.2f}ms  {key}")
+            continue
+
+        return None 
+
+
 # ooooooooo.             oooo                .       .
 # `888   `Y88.           `888              .o8     .o8
 #  888   .d88'  .oooo.    888   .ooooo.  .o888oo .o888oo  .ooooo.
@@ -1541,90 +3789,316 @@ class NOODLER_PT_shortcuts_memo(bpy.types.Panel):
 # o888o        `Y888""8o o888o `Y8bod8P'   "888"   "888" `Y8bod8P'
 
 
-#color palette api is completely broken, it only works with paint tools..
-#we need to check if context is node editor and and find active nodetree from msgbus function.. 
-#the problem is that context is not accessible from message bus, the following code is a workaround
+#color palette api is completely broken, it only works with paint tools..
+#we need to check if context is node editor and and find active nodetree from msgbus function.. 
+#the problem is that context is not accessible from message bus, the following code is a workaround
+
+palette_area = 0 #pointer of the node editor area the user last interacted with through noodler
+
+
+def set_palette_area(area):
+    """remember the node editor the user is working in, called on interactions only, never on draw"""
+
+    global palette_area
+
+    if (area is not None) and (area.type=="NODE_EDITOR"):
+        palette_area = area.as_pointer()
+
+    return None
+
+
+def get_palette_area():
+    """find the node editor the palette was clicked from, without any operator round-trip"""
+
+    area = bpy.context.area
+    if (area is not None) and (area.type=="NODE_EDITOR") and (area.spaces.active.node_tree is not None):
+        return area
+
+    editors = [a for a in bpy.context.window.screen.areas if (a.type=="NODE_EDITOR") and (a.spaces.active.node_tree is not None)]
+    if (len(editors)==0):
+        return None
+    if (len(editors)==1):
+        return editors[0]
+
+    for a in editors:
+        if (a.as_pointer()==palette_area):
+            return a
+        continue
+
+    return editors[0]
+
+
+def set_nodes_color(nodes, color=None, mask=None):
+    """bulk write custom colors of masked nodes (selection by default), only written if any node state changed.
+    color is one color or an (N,3) array of per node colors, a None color disable custom colors. return changed nodes count"""
+
+    count = len(nodes)
+    if (count==0):
+        return 0
+
+    if (mask is None):
+        mask = get_node_select(nodes)
+
+    use = numpy.empty(count, dtype=bool)
+    nodes.foreach_get("use_custom_color", use)
+
+    if (color is None):
+        changed = mask & use
+        if changed.any():
+            use[changed] = False
+            nodes.foreach_set("use_custom_color", use)
+        return int(changed.sum())
+
+    colors = numpy.empty(count*3, dtype=numpy.float32)
+    nodes.foreach_get("color", colors)
+    colors.shape = (count,3)
+    target = numpy.asarray(color, dtype=numpy.float32)
+    if (target.ndim==1):
+          target = numpy.broadcast_to(target[:3], (count,3))
+
+    changed_color = mask & numpy.any(numpy.abs(colors-target)>1e-6, axis=1)
+    changed_use = mask & ~use
+
+    if changed_color.any():
+        colors[changed_color] = target[changed_color]
+        nodes.foreach_set("color", colors.ravel())
+
+    if changed_use.any():
+        use[changed_use] = True
+        nodes.foreach_set("use_custom_color", use)
+
+    return int((changed_color|changed_use).sum())
+
+
+class NOODLER_OT_reset_color(bpy.types.Operator, ):
+
+    bl_idname = "noodler.reset_color"
+    bl_label = "Reset Color"
+    bl_description = "Reset Color"
+        
+    def execute(self, context, ):
+        
+        ng , _ = get_active_tree(context)
+        set_nodes_color(ng.nodes, None)
+        set_palette_area(context.area)
+        tag_area_redraw(context.area)
+
+        return {'FINISHED'}
+
+
+@profiled
+def palette_callback(*args):
+    """execute this function everytime user is clicking on a palette color""" 
+    #bpy.ops.noodler.reset_color()
+
+    area = get_palette_area()
+    if (area is None):
+        return None 
+
+    if not bpy.context.scene.tool_settings.unified_paint_settings.use_unified_color:
+        bpy.context.scene.tool_settings.unified_paint_settings.use_unified_color = True 
+    palette_color = bpy.context.tool_settings.unified_paint_settings.color
+
+    noodle_scn = bpy.context.scene.noodler
+    noodle_scn.palette_prop = list(palette_color)[:3]
+    if noodle_scn.frame_sync_color:
+        noodle_scn.frame_color = list(palette_color)[:3]
+
+    if set_nodes_color(area.spaces.active.edit_tree.nodes, palette_color):
+        tag_area_redraw(area)
+
+    return None 
+
+
+@profiled
+def palette_prop_upd(self, context):
+
+    if context.space_data is None:
+        return None 
+        
+    ng , _ = get_active_tree(context)
+    set_palette_area(context.area)
+    if set_nodes_color(ng.nodes, self.palette_prop):
+        tag_area_redraw(context.area)
+
+    return None 
+
+
+def compile_color_rules(rules):
+    """rules as NOODLER_PR_color_rule items or (field, pattern, color, target) tuples.
+    field in type/bl_idname/label, pattern is a case insensitive glob, target in ALL/NODES/FRAMES"""
+
+    compiled = []
+    for r in rules:
+        if isinstance(r, (tuple,list)):
+              field, pattern, color, target = (list(r)+["ALL"])[:4]
+        else: field, pattern, color, target = r.field, r.pattern, r.color, r.target
+        compiled.append((field, re.compile(fnmatch.translate(pattern.lower())).match, tuple(color[:3]), target))
+        continue
+
+    return compiled
+
+
+def get_rule_color(rules, node_type, bl_idname, label):
+    """color of the first matching rule, None if no rule match"""
+
+    is_frame = (node_type=="FRAME")
+    values = {"type":node_type.lower(), "bl_idname":bl_idname.lower(), "label":label.lower()}
+
+    for field, match, color, target in rules:
+        if (target=="NODES" and is_frame) or (target=="FRAMES" and not is_frame):
+            continue
+        if match(values[field]):
+            return color
+        continue
+
+    return None
+
+
+def apply_color_rules_to_tree(node_tree, rules):
+    """recolor nodes of a nodetree from compiled rules, in bulk, unmatched nodes are untouched. return changed nodes count"""
+
+    nodes = node_tree.nodes
+    count = len(nodes)
+
+    mask = numpy.zeros(count, dtype=bool)
+    colors = numpy.zeros((count,3), dtype=numpy.float32)
+    cache = {} #(type, bl_idname, label) -> color, few distinct keys per tree
+
+    for i,n in enumerate(nodes):
+        key = (n.type, n.bl_idname, n.label)
+        if (key not in cache):
+            cache[key] = get_rule_color(rules, *key)
+        color = cache[key]
+        if (color is not None):
+            mask[i] = True
+            colors[i] = color
+        continue
+
+    if (not mask.any()):
+        return 0
+
+    return set_nodes_color(nodes, colors, mask)
+
+
+def get_group_trees(node_trees):
+    """given nodetrees & all nodegroups nested in them, once"""
+
+    found = {}
+    stack = list(node_trees)
+
+    while stack:
+        ng = stack.pop()
+        if (ng is None) or (ng.as_pointer() in found):
+            continue
+        found[ng.as_pointer()] = ng
+        stack += [n.node_tree for n in ng.nodes if (n.type=="GROUP")]
+        continue
+
+    return list(found.values())
+
+
+def get_rule_trees(context, scope="ACTIVE", include_groups=True):
+    """nodetrees to recolor, from the active tree, the selected objects materials, or the whole file"""
+
+    if (scope=="ACTIVE"):
+        trees = [get_active_tree(context)[0]]
+
+    elif (scope=="SELECTED"):
+        materials = {s.material for o in context.selected_objects for s in o.material_slots if (s.material is not None)}
+        trees = [m.node_tree for m in materials if (m.node_tree is not None)]
+
+    else:
+        trees = [ng for _, _, ng in iter_file_trees()]
 
-mouse_coord = (0,0) 
+    if include_groups:
+        trees = get_group_trees(trees)
 
-class NOODLER_OT_get_mouse_location(bpy.types.Operator):
+    return trees
 
-    bl_idname = "noodler.get_mouse_location"
-    bl_label = ""
-    bl_options = {'REGISTER'}
 
-    def invoke(self, context, event): #How about we have bpy.context.event instead of this workaround ? hu? 
+def apply_color_rules(node_trees, rules):
+    """headless api, recolor given nodetrees with rules (see compile_color_rules), return a report dict"""
 
-        global mouse_coord
-        mouse_coord = event.mouse_x,event.mouse_y
+    t = time.perf_counter()
+    rules = compile_color_rules(rules)
 
-        return {'FINISHED'}
+    changed = 0
+    node_trees = list(node_trees)
+    for ng in node_trees:
+        changed += apply_color_rules_to_tree(ng, rules)
+        continue
 
+    return {"trees":len(node_trees), "changed":changed, "time":time.perf_counter()-t}
 
-class NOODLER_OT_reset_color(bpy.types.Operator, ):
 
-    bl_idname = "noodler.reset_color"
-    bl_label = "Reset Color"
-    bl_description = "Reset Color"
-        
-    def execute(self, context, ):
-        
-        ng , _ = get_active_tree(context)
-        for n in ng.nodes:
-            if n.select:
-                n.use_custom_color = False
+class NOODLER_OT_color_rule_edit(bpy.types.Operator):
 
-        return {'FINISHED'}
+    bl_idname      = "noodler.color_rule_edit"
+    bl_label       = "Edit Color Rules"
+    bl_description = "Add, remove or reorder color rules, first matching rule wins"
 
+    action : bpy.props.EnumProperty(default="ADD",items=[("ADD","Add","",),("REMOVE","Remove","",),("UP","Up","",),("DOWN","Down","",),], name="Action") 
 
-def palette_callback(*args):
-    """execute this function everytime user is clicking on a palette color""" 
-    #bpy.ops.noodler.reset_color()
+    def execute(self, context):
 
-    bpy.ops.noodler.get_mouse_location(('INVOKE_DEFAULT'))
-    global mouse_coord
+        noodle_scn = context.scene.noodler
+        rules, idx = noodle_scn.color_rules, noodle_scn.color_rules_index
 
-    space = get_space_from_mouse(mouse_coord[0], mouse_coord[1])
-    if (space is None) or (space.type!="NODE_EDITOR"):
-        return None 
+        if (self.action=="ADD"):
+            rule = rules.add()
+            rule.color = noodle_scn.palette_prop
+            noodle_scn.color_rules_index = len(rules)-1
 
-    if not bpy.context.scene.tool_settings.unified_paint_settings.use_unified_color:
-        bpy.context.scene.tool_settings.unified_paint_settings.use_unified_color = True 
-    palette_color = bpy.context.tool_settings.unified_paint_settings.color
+        elif (len(rules)==0) or not (0 <= idx < len(rules)):
+            return {"FINISHED"}
 
-    noodle_scn = bpy.context.scene.noodler
-    noodle_scn.palette_prop = list(palette_color)[:3]
-    if noodle_scn.frame_sync_color:
-        noodle_scn.frame_color = list(palette_color)[:3]
+        elif (self.action=="REMOVE"):
+            rules.remove(idx)
+            noodle_scn.color_rules_index = min(idx, len(rules)-1)
 
-    ng = space.node_tree
-    for n in ng.nodes:
-        if n.select:
-            n.use_custom_color=True
-            n.color = palette_color
+        else:
+            new = idx-1 if (self.action=="UP") else idx+1
+            if (0 <= new < len(rules)):
+                rules.move(idx, new)
+                noodle_scn.color_rules_index = new
 
-    return None 
+        return {"FINISHED"}
 
 
-def palette_prop_upd(self, context):
+class NOODLER_OT_apply_color_rules(bpy.types.Operator):
 
-    if context.space_data is None:
-        return None 
-        
-    ng , _ = get_active_tree(context)
-    for n in ng.nodes:
-        if n.select:
-            if not n.use_custom_color:
-                n.use_custom_color = True
-            n.color = self.palette_prop
+    bl_idname      = "noodler.apply_color_rules"
+    bl_label       = "Apply Color Rules"
+    bl_description = "Recolor nodes matching the color rules"
+    bl_options     = {'REGISTER', 'UNDO'}
 
-    return None 
+    scope : bpy.props.EnumProperty(default="ACTIVE",items=[("ACTIVE","Active Tree","",),("SELECTED","Selected Materials","",),("FILE","Whole File","",),], name="Scope") 
+    include_groups : bpy.props.BoolProperty(default=True, name="Include Nested Groups",)
+
+    def execute(self, context):
+
+        rules = context.scene.noodler.color_rules
+        if (len(rules)==0):
+            self.report({"WARNING"}, "Noodler: no color rules")
+            return {"CANCELLED"}
+
+        if (self.scope=="ACTIVE") and ((context.space_data is None) or (context.space_data.type!="NODE_EDITOR") or (context.space_data.node_tree is None)):
+            self.report({"WARNING"}, "Noodler: no active nodetree")
+            return {"CANCELLED"}
+
+        report = apply_color_rules(get_rule_trees(context, self.scope, self.include_groups), rules)
+        self.report({"INFO"}, f"Noodler: recolored {report['changed']} node(s) in {report['trees']} tree(s), {report['time']:.2f}s")
+
+        return {"FINISHED"}
 
 
 @bpy.app.handlers.persistent
 def noodler_load_post(scene,desp): 
     
     print(f"noodler_load_post")
+
+    clear_tree_caches()
     
     bpy.msgbus.subscribe_rna(
         key=bpy.types.PaletteColor,#get notified when active color change
@@ -1648,28 +4122,68 @@ def noodler_load_post(scene,desp):
 #\u2605=★
 
 
-def get_favorites(nodes, index=None):
+FAVORITES_KEY = "noodler_favorites"
 
-    favs = []
 
-    for n in nodes:
-        if n.name.startswith("★"):
-            favs.append(n)
-        continue
+def favorite_sort_key(name):
+    """natural sort, so ★100 come after ★99"""
+
+    return [int(t) if t.isdigit() else t for t in re.split(r"(\d+)", name)]
+
+
+FavoritesFresh = set() #pointers of trees with a registry built since their last depsgraph update
+
+
+def get_favorites_registry(node_tree, rebuild=False):
+    """sorted favorites names of a nodetree, kept in its ID properties.
+    rebuilt lazily when the tree got a depsgraph update (rename, deletion..), after a file load/undo,
+    when nodes count changed since last build, or when asked to"""
+
+    nodes = node_tree.nodes
+    key = node_tree.as_pointer()
+    registry = node_tree.get(FAVORITES_KEY)
+
+    if (not rebuild) and (registry is not None) and (key in FavoritesFresh) and (registry["count"]==len(nodes)):
+        return list(registry["names"])
+
+    names = sorted((n.name for n in nodes if n.name.startswith("★")), key=favorite_sort_key)
+    node_tree[FAVORITES_KEY] = {"count":len(nodes), "names":names}
+    FavoritesFresh.add(key)
+
+    return names
+
+
+def add_favorite_to_registry(node_tree, name):
+    """register a newly created favorite, keeping the registry sorted"""
+
+    names = get_favorites_registry(node_tree)
+    if (name not in names):
+        names.append(name)
+        names.sort(key=favorite_sort_key)
+    node_tree[FAVORITES_KEY] = {"count":len(node_tree.nodes), "names":names}
 
-    def namesort(elem):
-        return elem.name
-    favs.sort(key=namesort)
+    return None
+
+
+def get_favorites(nodes, index=None):
+
+    ng = nodes.id_data
+    names = get_favorites_registry(ng)
 
     if (index is not None):
-        for i,n in enumerate(favs):
-            if (i==index):
-                return n
-        return None 
+        if not (0 <= index < len(names)):
+            return None
+        n = nodes.get(names[index])
+        #renamed or removed favorite? registry is stale
+        if (n is None) or (not n.name.startswith("★")):
+            names = get_favorites_registry(ng, rebuild=True)
+            n = nodes.get(names[index]) if (index < len(names)) else None
+        return n
 
-    return favs
+    return [n for n in (nodes.get(name) for name in names) if (n is not None)]
 
 
+@profiled
 def favorite_index_upd(self, context):
 
     ng , _ = get_active_tree(context)
@@ -1678,8 +4192,10 @@ def favorite_index_upd(self, context):
     if n is None:
         return None 
 
-    set_all_node_select(ng.nodes, False,)
-    n.select = True 
+    selection = SelectionTransaction(ng.nodes, clear=True)
+    selection.select(n)
+    selection.commit()
+    tag_area_redraw(context.area)
 
     override = bpy.context.copy()
     override["area"] = context.area
@@ -1701,18 +4217,17 @@ class NOODLER_OT_favorite_add(bpy.types.Operator):
         ng = context.space_data.node_tree
         noodle_scn = context.scene.noodler
 
+        names = set(get_favorites_registry(ng))
+
         idx = 1
         name = f"★{idx:02}"
-        while name in [n.name for n in ng.nodes]:
+        while name in names:
             idx +=1
             name = f"★{idx:02}"
 
-        if (idx>50):
-            popup_menu([f"You reached {idx-1} favorites.","Sorry mate. It's for your own good.",],"Congratulation!","FUND")
-            return {"FINISHED"}
-
         sh = ng.nodes.new("NodeReroute")
         sh.name = sh.label = name
+        add_favorite_to_registry(ng, sh.name)
         sh.inputs[0].display_shape = "SQUARE"
         #hide? 
         #sh.inputs[0].enabled = False 
@@ -1736,8 +4251,7 @@ class NOODLER_OT_favorite_loop(bpy.types.Operator):
         ng = context.space_data.node_tree
         noodle_scn = context.scene.noodler
 
-        favs = get_favorites(ng.nodes)
-        favs_len = len(favs)
+        favs_len = len(get_favorites_registry(ng))
 
         if (favs_len==0):
 
@@ -1752,6 +4266,8 @@ class NOODLER_OT_favorite_loop(bpy.types.Operator):
         else: noodle_scn.favorite_index += 1
 
         sh = get_favorites(ng.nodes, index=noodle_scn.favorite_index)
+        if (sh is None):
+            return {"FINISHED"}
         ng.nodes.active = sh 
 
         blf_temporary_msg(text=f"Looping to Favorite '{sh.label}'", size=[25,45], position=[20,20], origin="BOTTOM LEFT", color=[0.9,0.9,0.9,0.9], shadow={"blur":3,"color":[0,0,0,0.4],"offset":[2,-2],})
@@ -1769,78 +4285,385 @@ class NOODLER_OT_favorite_loop(bpy.types.Operator):
 # 8""88888P'  `Y8bod8P' `Y888""8o d888b    `Y8bod8P' o888o o888o
 
 
-def search_upd(self, context):
-    """search in context nodetree for nodes"""
+SEARCH_FIELDS = ("labels", "types", "names", "socket_names", "socket_types")
 
-    ng , _ = get_active_tree(context)
+SEARCH_SCORES = {"exact":3.0, "prefix":2.0, "substring":1.0, "typo":0.5}
 
-    keywords = self.search_keywords.lower().replace(","," ").split(" ")
-    keywords = set(keywords)
 
-    def is_matching(keywords,terms):
-        matches = []
+def is_one_edit(a, b):
+    """check if two different strings are one insertion, deletion, substitution or transposition apart"""
+
+    la, lb = len(a), len(b)
+    if (a==b) or (abs(la-lb)>1):
+        return False
+    if (la>lb):
+        a, b, la, lb = b, a, lb, la
+
+    #skip common prefix
+    i = 0
+    while (i<la) and (a[i]==b[i]):
+        i += 1
+
+    if (la==lb):
+        return (a[i+1:]==b[i+1:]) or (a[i+2:]==b[i+2:] and a[i]==b[i+1] and a[i+1]==b[i])
+
+    return a[i:]==b[i+1:]
+
+
+
+class SearchIndex():
+    """inverted index of a nodetree, field -> term -> set of node names.
+    built once, then synchronized incrementally with nodes added/renamed/removed"""
+
+    def __init__(self):
+
+        self.keys = {} #node name -> label, used to detect changes
+        self.infos = {} #node name -> (type, inputs count)
+        self.terms = {} #node name -> {field: set of terms}
+        self.postings = {f:{} for f in SEARCH_FIELDS} #field -> term -> set of node names
+        self.vocabulary = {f:None for f in SEARCH_FIELDS} #field -> sorted terms, rebuilt lazily
+        self.order = [] #node names in tree order
+        self.index = {} #node name -> node index
+
+    def get_node_terms(self, n):
+        """terms of a node for each search field"""
+
+        label = n.label.lower()
+        if not label:
+            label = n.bl_label.lower()
+        sockets = [*list(n.inputs),*list(n.outputs)]
+
+        return {
+            "labels":set(label.split(" ")),
+            "types":set(n.type.lower().split(" ")),
+            "names":set((n.name + " " + n.bl_idname).replace("_"," ").lower().split(" ")),
+            "socket_names":{t for s in sockets for t in s.name.lower().split(" ")},
+            "socket_types":{t for s in sockets for t in s.type.lower().split(" ")},
+            }
+
+    def add(self, n):
+
+        terms = self.terms[n.name] = self.get_node_terms(n)
+        self.keys[n.name] = n.label
+        self.infos[n.name] = (n.type, len(n.inputs))
+
+        for f in SEARCH_FIELDS:
+            postings = self.postings[f]
+            for t in terms[f]:
+                if (t not in postings):
+                    postings[t] = set()
+                    self.vocabulary[f] = None
+                postings[t].add(n.name)
+                continue
+            continue
+
+        return None
+
+    def remove(self, name):
+
+        terms = self.terms.pop(name)
+        del self.keys[name]
+        del self.infos[name]
+
+        for f in SEARCH_FIELDS:
+            postings = self.postings[f]
+            for t in terms[f]:
+                postings[t].discard(name)
+                if not postings[t]:
+                    del postings[t]
+                    self.vocabulary[f] = None
+                continue
+            continue
+
+        return None
+
+    def sync(self, nodes):
+        """only re-index nodes that got added, renamed, relabeled or removed"""
+
+        keys = {n.name:n.label for n in nodes}
+
+        for name in [k for k in self.keys if (keys.get(k)!=self.keys[k])]:
+            self.remove(name)
+
+        for name,label in keys.items():
+            if (self.keys.get(name)!=label):
+                self.add(nodes[name])
+            continue
+
+        if (list(keys)!=self.order):
+            self.order = list(keys)
+            self.index = {name:i for i,name in enumerate(self.order)}
+
+        return None
+
+    def get_vocabulary(self, field):
+
+        if (self.vocabulary[field] is None):
+            self.vocabulary[field] = sorted(self.postings[field])
+
+        return self.vocabulary[field]
+
+    def lookup(self, keyword, fields, mode="substring"):
+        """node names matching the keyword in given fields, mode in 'exact', 'prefix', 'substring' or 'typo'"""
+
+        found = set()
+
+        for f in fields:
+            postings = self.postings[f]
+
+            if (mode=="exact"):
+                found |= postings.get(keyword, set())
+                continue
+
+            vocabulary = self.get_vocabulary(f)
+
+            if (mode=="prefix"):
+                i = bisect_left(vocabulary, keyword)
+                while (i<len(vocabulary)) and vocabulary[i].startswith(keyword):
+                    found |= postings[vocabulary[i]]
+                    i += 1
+                continue
+
+            if (mode=="typo"):
+                for t in vocabulary:
+                    if is_one_edit(keyword, t):
+                        found |= postings[t]
+                    continue
+                continue
+
+            for t in vocabulary:
+                if (keyword in t):
+                    found |= postings[t]
+                continue
+
+            continue
+
+        return found
+
+    def filter(self, names, input_only=False, frame_only=False):
+        """apply the input only/frame only search filters"""
+
+        if input_only:
+            names = [name for name in names if (self.infos[name][1]==0 and self.infos[name][0]!="FRAME")]
+
+        if frame_only:
+            names = [name for name in names if (self.infos[name][0]=="FRAME")]
+
+        return names
+
+    def score(self, keywords, fields):
+        """node name -> score of nodes matching any keyword. each keyword add its best score to the node"""
+
+        scores = {}
+
         for k in keywords:
-            for t in terms:
-                matches.append(k in t)
-        return any(matches) 
-
-    found = []
-    for n in ng.nodes:
-        terms = []
-
-        if self.search_labels:
-            name = n.label.lower()
-            if not name:
-                name = n.bl_label.lower()
-            terms += name.split(" ")
-
-        if self.search_types:
-            terms += n.type.lower().split(" ")
-
-        if self.search_names:
-            name = n.name + " " + n.bl_idname
-            terms += name.replace("_"," ").lower().split(" ")
-
-        if self.search_socket_names:
-            for s in [*list(n.inputs),*list(n.outputs)]:
-                name = s.name.lower() 
-                if name not in terms:
-                    terms += name.split(" ")
-
-        if self.search_socket_types:
-            for s in [*list(n.inputs),*list(n.outputs)]:
-                name = s.type.lower() 
-                if name not in terms:
-                    terms += name.split(" ")
-
-        if not is_matching(keywords,terms):
+            best = {}
+            for mode,score in SEARCH_SCORES.items():
+                #typo tolerance on very short keywords would match almost anything
+                if (mode=="typo") and (len(k)<3):
+                    continue
+                for name in self.lookup(k, fields, mode=mode):
+                    if (best.get(name,0)<score):
+                        best[name] = score
+                    continue
+                continue
+            for name,score in best.items():
+                scores[name] = scores.get(name,0) + score
             continue
 
-        found.append(n)
+        return scores
+
+    def rank(self, keywords, fields):
+        """node names matching any keyword, best matches first"""
+
+        scores = self.score(keywords, fields)
+
+        return sorted(scores, key=lambda name: (-scores[name], self.index[name]))
+
+
+SearchIndexes = {}
+
+def get_search_index(node_tree):
+    """get the search index of a nodetree, synchronized with its nodes"""
 
+    global SearchIndexes
+
+    key = node_tree.as_pointer()
+    index = SearchIndexes.get(key)
+
+    if (index is None):
+        index = SearchIndexes[key] = SearchIndex()
+    index.sync(node_tree.nodes)
+
+    return index
+
+
+#bpy.data collections owning nodetrees, node_groups are trees themselves
+TREE_OWNERS = ("node_groups", "materials", "worlds", "lights", "scenes", "textures", "linestyles")
+
+def get_id_tree(owner, idb):
+    """get the nodetree of an ID of the given owner collection"""
+
+    return idb if (owner=="node_groups") else getattr(idb, "node_tree", None)
+
+
+def iter_file_trees():
+    """(owner collection name, owner, nodetree) of every nodetree of the file"""
+
+    for owner in TREE_OWNERS:
+        for idb in getattr(bpy.data, owner):
+            ng = get_id_tree(owner, idb)
+            if (ng is not None):
+                yield owner, idb, ng
+            continue
         continue
 
-    set_all_node_select(ng.nodes, False,)
 
-    self.search_found = len(found)
-    if (self.search_found==0):
+def get_owner_tree(owner, name):
+    """get a nodetree from its owner collection name & owner name"""
+
+    idb = getattr(bpy.data, owner).get(name)
+    if (idb is None):
         return None
 
-    if self.search_input_only:
-        for n in found.copy():
-            if (len(n.inputs)==0 and (n.type!="FRAME")):
-                continue
-            found.remove(n)
+    return get_id_tree(owner, idb)
+
+
+def get_owners_count():
+    """number of IDs able to own a nodetree, cheap way to detect added/removed trees"""
+
+    return sum(len(getattr(bpy.data, owner)) for owner in TREE_OWNERS)
+
+
+class GlobalSearch():
+    """shared search over every nodetree of the file, using the per tree indexes.
+    trees are only re-synchronized when the depsgraph reported them as updated,
+    the file is only enumerated again when the owners count changed or an updated tree is unknown"""
+
+    def __init__(self):
+
+        self.trees = {} #tree pointer -> (owner collection name, owner name)
+        self.dirty = set() #tree pointers to re-synchronize
+        self.count = None #owners count at last enumeration
+
+    def clear(self):
+
+        self.trees.clear()
+        self.dirty.clear()
+        self.count = None
+
+        return None
+
+    def enumerate(self):
+        """full pass over the file trees"""
+
+        trees = {ng.as_pointer():(owner, idb.name) for owner, idb, ng in iter_file_trees()}
+
+        for key,(owner,name) in trees.items():
+            #lazily index new trees, re-sync updated ones
+            if (key not in self.trees) or (key in self.dirty) or (key not in SearchIndexes):
+                get_search_index(get_owner_tree(owner, name))
+            continue
+
+        for key in set(self.trees)-set(trees):
+            SearchIndexes.pop(key, None)
+
+        self.trees = trees
+        self.count = get_owners_count()
+        self.dirty.clear()
+
+        return None
+
+    def sync(self):
+
+        if (self.count!=get_owners_count()) or (not self.dirty <= set(self.trees)):
+            return self.enumerate()
+
+        for key in self.dirty:
+            owner, name = self.trees[key]
+            ng = get_owner_tree(owner, name)
+            #owner renamed or tree replaced
+            if (ng is None) or (ng.as_pointer()!=key):
+                return self.enumerate()
+            get_search_index(ng)
+            continue
+
+        self.dirty.clear()
+
+        return None
+
+    def search(self, keywords, fields, input_only=False, frame_only=False):
+        """(score, owner, owner name, node name) hits over every nodetree, best first"""
+
+        self.sync()
+
+        hits = []
+        for key,(owner,name) in self.trees.items():
+            search = SearchIndexes[key]
+            scores = search.score(keywords, fields)
+            for node in search.filter(scores, input_only=input_only, frame_only=frame_only):
+                hits.append((scores[node], owner, name, node))
             continue
 
-    if self.search_frame_only:
-        for n in found.copy():
-            if (n.type!="FRAME"):
-                found.remove(n)
+        hits.sort(key=lambda h: (-h[0], h[1], h[2], h[3]))
+
+        return hits
+
+
+AllTreesSearch = GlobalSearch()
+
+
+@profiled
+def search_upd(self, context):
+    """search in context nodetree for nodes"""
+
+    keywords = self.search_keywords.lower().replace(","," ").split(" ")
+    keywords = {k for k in keywords if k}
+
+    fields = [f for f in SEARCH_FIELDS if getattr(self, f"search_{f}")]
+
+    #search in all nodetrees of the file? results will open the right tree
+    if self.search_global:
+
+        hits = AllTreesSearch.search(keywords, fields, input_only=self.search_input_only, frame_only=self.search_frame_only)
+        self.search_found = len(hits)
+
+        self.search_results.clear()
+        for _, owner, name, node in hits[:self.search_limit]:
+            r = self.search_results.add()
+            r.node = node
+            r.owner = owner
+            r.owner_name = name
+            r.name = f"{node} ({name})"
             continue
+        self["search_result_index"] = 0 #set without triggering the jump update
+
+        return None
+
+    ng , _ = get_active_tree(context)
+    search = get_search_index(ng)
+
+    found = search.filter(search.rank(keywords, fields), input_only=self.search_input_only, frame_only=self.search_frame_only)
+
+    #only keep best results
+    self.search_found = len(found)
+    found = found[:self.search_limit]
+
+    self.search_results.clear()
+    for name in found:
+        r = self.search_results.add()
+        r.node = name
+        r.name = f"{ng.nodes[name].label or ng.nodes[name].bl_label} ({name})"
+        continue
+    self["search_result_index"] = 0 #set without triggering the jump update
+
+    selection = SelectionTransaction(ng.nodes, clear=True)
+    selection.wanted[[search.index[name] for name in found]] = True
+    selection.commit()
+    tag_area_redraw(context.area)
 
-    for n in found:
-        n.select = True 
+    if (len(found)==0):
+        return None
 
     if self.search_center:
 
@@ -1855,6 +4678,68 @@ def search_upd(self, context):
     return None
 
 
+@profiled
+def search_result_upd(self, context):
+    """jump to the active search result"""
+
+    if not (0 <= self.search_result_index < len(self.search_results)):
+        return None
+
+    r = self.search_results[self.search_result_index]
+
+    if r.owner:
+        #result from another nodetree, open it in the editor
+        ng = get_owner_tree(r.owner, r.owner_name)
+        if (ng is None):
+            return None
+        space = context.space_data
+        if (space.node_tree!=ng):
+            space.tree_type = ng.bl_idname
+            space.pin = True
+            space.node_tree = ng
+    else:
+        ng , _ = get_active_tree(context)
+
+    n = ng.nodes.get(r.node)
+    if n is None:
+        return None
+
+    selection = SelectionTransaction(ng.nodes, clear=True)
+    selection.select(n)
+    selection.commit()
+    ng.nodes.active = n
+    tag_area_redraw(context.area)
+
+    override = bpy.context.copy()
+    override["area"] = context.area
+    override["space"] = context.area.spaces[0]
+    override["region"] = context.area.regions[3]
+    bpy.ops.node.view_selected((override))
+
+    return None
+
+
+class NOODLER_OT_search_jump(bpy.types.Operator):
+
+    bl_idname      = "noodler.search_jump"
+    bl_label       = "Jump to search result"
+    bl_description = "Jump to next/previous search result"
+
+    direction : bpy.props.EnumProperty(default="next",items=[("next","Next","",),("previous","Previous","",),], name="Direction") 
+
+    def execute(self, context):
+
+        noodle_scn = context.scene.noodler
+        results_len = len(noodle_scn.search_results)
+        if (results_len==0):
+            return {"FINISHED"}
+
+        step = 1 if (self.direction=="next") else -1
+        noodle_scn.search_result_index = (noodle_scn.search_result_index+step) % results_len
+
+        return {"FINISHED"}
+
+
 # ooooooooo.
 # `888   `Y88.
 #  888   .d88' oooo d8b  .ooooo.  oo.ooooo.   .oooo.o
@@ -1866,6 +4751,23 @@ def search_upd(self, context):
 #                                 o888o
 
 
+class NOODLER_PR_search_result(bpy.types.PropertyGroup): 
+    """noodle_scn.search_results items, name is used for display"""
+
+    node: bpy.props.StringProperty(default="",name="Node Name")
+    owner: bpy.props.StringProperty(default="",name="Owner Collection",description="bpy.data collection owning the nodetree, empty for the active tree")
+    owner_name: bpy.props.StringProperty(default="",name="Owner Name")
+
+
+class NOODLER_PR_color_rule(bpy.types.PropertyGroup): 
+    """noodle_scn.color_rules items"""
+
+    field: bpy.props.EnumProperty(default="type",items=[("type","Type","Match the node type, such as MATH or FRAME",),("bl_idname","Idname","Match the node bl_idname, such as ShaderNodeMath",),("label","Label","Match the node label",),], name="Field") 
+    pattern: bpy.props.StringProperty(default="*",name="Pattern",description="Case insensitive pattern, * and ? wildcards supported")
+    target: bpy.props.EnumProperty(default="ALL",items=[("ALL","All","Apply to nodes & frames",),("NODES","Nodes","Ignore frames",),("FRAMES","Frames","Only apply to frames",),], name="Target") 
+    color: bpy.props.FloatVectorProperty(default=(0.5,0.5,0.5),min=0,max=1,subtype="COLOR",name="Color")
+
+
 class NOODLER_PR_scene(bpy.types.PropertyGroup): 
     """noodle_scn = bpy.context.scene.noodler"""
 
@@ -1887,9 +4789,16 @@ class NOODLER_PR_scene(bpy.types.PropertyGroup):
     search_input_only: bpy.props.BoolProperty(default=False,name="Input Only",update=search_upd)
     search_frame_only: bpy.props.BoolProperty(default=False,name="Frame Only",update=search_upd)
     search_found: bpy.props.IntProperty(default=0)
+    search_limit: bpy.props.IntProperty(default=10,min=1,name="Max Results",update=search_upd)
+    search_global: bpy.props.BoolProperty(default=False,name="All Node Trees",description="Search in every nodetree of the file",update=search_upd)
+    search_results: bpy.props.CollectionProperty(type=NOODLER_PR_search_result)
+    search_result_index: bpy.props.IntProperty(default=0,update=search_result_upd)
 
     favorite_index : bpy.props.IntProperty(default=0,update=favorite_index_upd,)
 
+    color_rules: bpy.props.CollectionProperty(type=NOODLER_PR_color_rule)
+    color_rules_index: bpy.props.IntProperty(default=0)
+
 
 # ooooooooo.                         o8o               .
 # `888   `Y88.                       `"'             .o8
@@ -1925,17 +4834,27 @@ classes = (
 
     NOODLER_PT_tool_search,
     NOODLER_PT_tool_color_palette,
+    NOODLER_UL_color_rules,
+    NOODLER_PT_color_rules,
     NOODLER_PT_tool_frame,
     NOODLER_PT_shortcuts_memo,
+    NOODLER_PT_profiler,
 
+    NOODLER_PR_search_result,
+    NOODLER_PR_color_rule,
     NOODLER_PR_scene,
 
-    NOODLER_OT_get_mouse_location,
     NOODLER_OT_reset_color,
+    NOODLER_OT_color_rule_edit,
+    NOODLER_OT_apply_color_rules,
 
     NOODLER_OT_draw_route,
+    NOODLER_OT_auto_route,
     NOODLER_OT_draw_frame,
     NOODLER_OT_chamfer,
+    NOODLER_OT_simplify_reroutes,
+    NOODLER_OT_auto_frame,
+    NOODLER_OT_reframe_all,
 
     NOODLER_OT_favorite_add,
     NOODLER_OT_favorite_loop,
@@ -1943,6 +4862,12 @@ classes = (
     NOODLER_OT_dependency_select,
 
     NOODLER_OT_node_purge_unused,
+    NOODLER_OT_node_auto_layout,
+
+    NOODLER_OT_search_jump,
+
+    NOODLER_OT_profiler_reset,
+    NOODLER_OT_profiler_export,
     )
 
 
@@ -1952,6 +4877,11 @@ def node_purge_unused_menu(self, context):
     layout = self.layout 
     layout.separator()
     layout.operator("noodler.node_purge_unused", text="Purge Unused Nodes",)
+    layout.operator("noodler.node_auto_layout", text="Auto Layout Nodes",)
+    layout.operator("noodler.auto_frame", text="Auto Frame Nodes",)
+    layout.operator("noodler.reframe_all", text="Re-Frame All",)
+    layout.operator("noodler.simplify_reroutes", text="Simplify Reroutes",)
+    layout.operator("noodler.auto_route", text="Auto Route Links",)
 
     return None
 
@@ -1959,8 +4889,14 @@ def node_purge_unused_menu(self, context):
 def register():
 
     for cls in classes:
+        if issubclass(cls, bpy.types.Operator):
+            profile_operator(cls)
         bpy.utils.register_class(cls)
 
+    #timings are opt-in
+    NoodlerProfiler.enabled = is_profiling()
+    NoodlerProfiler.diagnostics = is_diagnosing()
+
     #extend header menu
     bpy.types.NODE_MT_node.append(node_purge_unused_menu)
 
@@ -1979,6 +4915,13 @@ def register():
     #load post update for palette msgbus, unfortunately, not so 'persistent'
     bpy.app.handlers.load_post.append(noodler_load_post)
 
+    #drop outdated links snapshots
+    bpy.app.handlers.depsgraph_update_post.append(noodler_depsgraph_post)
+
+    #trees pointers are not reliable after an undo
+    bpy.app.handlers.undo_post.append(noodler_undo_post)
+    bpy.app.handlers.redo_post.append(noodler_undo_post)
+
     #keymaps
     addon_keymaps.clear()
     kc = bpy.context.window_manager.keyconfigs.addon
@@ -2002,10 +4945,20 @@ def unregister():
 
     #remove handler 
     bpy.app.handlers.load_post.remove(noodler_load_post)
+    bpy.app.handlers.depsgraph_update_post.remove(noodler_depsgraph_post)
+    bpy.app.handlers.undo_post.remove(noodler_undo_post)
+    bpy.app.handlers.redo_post.remove(noodler_undo_post)
+    clear_tree_caches()
     
     #color palette update
     bpy.msgbus.clear_by_owner(palette_msgbus_owner)
 
+    #overlay texts & previews
+    NoodlerOverlay.previews.clear()
+    blf_clear_all_fonts()
+    if bpy.app.timers.is_registered(overlay_expire):
+        bpy.app.timers.unregister(overlay_expire)
+
     #properties 
     del bpy.types.Scene.noodler 
 
@@ -0,0 +1,320 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Noodler headless benchmark suite, synthetic shader & geometry trees of 100 to 50k nodes
+
+usage:
+    blender -b --factory-startup --python noodler_benchmark.py -- --sizes 100 1000 10000 50000 --output noodler_bench.json
+
+results are written as json, one entry per tree kind/size/feature, timings in milliseconds.
+note that in background mode nodes are never drawn, so node dimensions are zero, picking, framing & routing only see locations.
+"""
+
+import bpy
+import os, sys, json, time, random, argparse, platform
+import numpy
+
+#use the installed addon if enabled, else the noodler.py next to this script
+
+noodler = sys.modules.get("noodler")
+if (noodler is None):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import noodler
+    noodler.register()
+
+#headless context & operators helpers, shared with the tests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests"))
+from headless import get_fake_context, borrow
+
+
+TREE_KINDS = {
+    "SHADER" : {
+        "idname":"ShaderNodeTree",
+        "types":["ShaderNodeMath","ShaderNodeVectorMath","ShaderNodeMix","ShaderNodeSeparateXYZ","ShaderNodeCombineXYZ","ShaderNodeMapRange",],
+        },
+    "GEOMETRY" : {
+        "idname":"GeometryNodeTree",
+        "types":["ShaderNodeMath","ShaderNodeVectorMath","GeometryNodeSetPosition","GeometryNodeTransform","GeometryNodeJoinGeometry","GeometryNodeInputPosition",],
+        },
+    }
+
+
+#   .oooooo.o                             .   oooo                      .    o8o
+#  d8P'    `Y8                           .o8   `888                    .o8    `"'
+#  Y88bo.      oooo    ooo ooo. .oo.   .o888oo  888 .oo.    .ooooo.  .o888oo oooo   .ooooo.
+#   `"Y8888o.   `88.  .8'  `888P"Y88b    888    888P"Y88b  d88' `88b   888   `888  d88' `"Y8
+#       `"Y88b   `88..8'    888   888    888    888   888  888ooo888   888    888  888
+#  oo     .d8P    `888'     888   888    888 .  888   888  888    .o   888 .  888  888   .o8
+#  8""88888P'      .8'     o888o o888o   "888" o888o o888o `Y8bod8P'   "888" o888o `Y8bod8P'
+#              .o..P'
+#              `Y8P'
+
+
+def build_tree(kind="SHADER", count=1000, seed=0):
+    """build a synthetic nodegroup of roughly `count` nodes, layered like real trees:
+    fan-in from the previous layers, reroute chains on some links, frames around blocks, a few ★ favorites & dead branches"""
+
+    rng = random.Random(seed)
+    spec = TREE_KINDS[kind]
+
+    ng = bpy.data.node_groups.new(f"NoodlerBench_{kind}_{count}", spec["idname"])
+    nodes, links = ng.nodes, ng.links
+
+    if hasattr(ng, "interface"):
+          ng.interface.new_socket("Geometry" if (kind=="GEOMETRY") else "Value", in_out="OUTPUT", socket_type="NodeSocketGeometry" if (kind=="GEOMETRY") else "NodeSocketFloat")
+    else: ng.outputs.new("NodeSocketGeometry" if (kind=="GEOMETRY") else "NodeSocketFloat", "Output")
+
+    #regular nodes, 70% of the budget, in layers of ~sqrt(n)
+    regular = max(int(count*0.7),2)
+    per_layer = max(int(regular**0.5),1)
+    layers = []
+
+    for i in range(regular):
+
+        l, row = divmod(i, per_layer)
+        if (row==0):
+            layers.append([])
+
+        n = nodes.new(rng.choice(spec["types"]))
+        n.location = (l*250, -row*180)
+        layers[-1].append(n)
+
+        #fan-in from one to three nodes of the previous layers
+        if (l>0):
+            for _ in range(rng.randint(1,3)):
+                src = rng.choice(layers[max(0,l-rng.randint(1,2))])
+                if (len(src.outputs)==0) or (len(n.inputs)==0):
+                    continue
+                links.new(src.outputs[0], n.inputs[rng.randrange(len(n.inputs))])
+                continue
+
+        continue
+
+    #everything ends in a group output, a few last nodes are left dangling on purpose
+    out = nodes.new("NodeGroupOutput")
+    out.location = (len(layers)*250, 0)
+    for n in layers[-1][:max(1,len(layers[-1])//2)]:
+        if len(n.outputs):
+            links.new(n.outputs[0], out.inputs[0])
+        continue
+
+    #reroute chains on existing links, 20% of the budget
+    reroutes = []
+    for _ in range(int(count*0.2)//3):
+
+        link = links[rng.randrange(len(links))]
+        if (link.from_node.type=="REROUTE") or (link.to_node.type=="REROUTE"):
+            continue
+
+        from_sock, to_sock = link.from_socket, link.to_socket
+        a, b = link.from_node.location, link.to_node.location
+        links.remove(link)
+
+        for k in range(3):
+            rr = nodes.new("NodeReroute")
+            rr.location = (a.x+(b.x-a.x)*(k+1)/4, a.y+(b.y-a.y)*(k+1)/4 + rng.uniform(-40,40))
+            links.new(from_sock, rr.inputs[0])
+            from_sock = rr.outputs[0]
+            reroutes.append(rr)
+            continue
+
+        links.new(from_sock, to_sock)
+        continue
+
+    #frames around blocks of a layer
+    frames = []
+    for l, layer in enumerate(layers):
+        if (l%3!=0):
+            continue
+        for block in range(0, len(layer), 10):
+            f = nodes.new("NodeFrame")
+            f.label = f"Block {l}.{block}"
+            for n in layer[block:block+10]:
+                n.parent = f
+                continue
+            frames.append(f)
+            continue
+        continue
+
+    #favorites
+    for i, n in enumerate(rng.sample(layers[0] + layers[-1], min(20, len(layers[0]+layers[-1])))):
+        n.name = f"★{i:02}"
+        continue
+
+    for n in nodes:
+        n.select = False
+
+    return ng
+
+
+#  oooooooooo.                                      oooo
+#  `888'   `Y8b                                     `888
+#   888     888  .ooooo.  ooo. .oo.    .ooooo.   888 .oo.   ooo. .oo.  .oo.    .oooo.   oooo d8b  oooo  oooo
+#   888oooo888' d88' `88b `888P"Y88b  d88' `"Y8  888P"Y88b  `888P"Y88bP"Y88b  `P  )88b  `888""8P  888   888
+#   888    `88b 888ooo888  888   888  888        888   888   888   888   888   .oP"888   888      888   888
+#   888    .88P 888    .o  888   888  888   .o8  888   888   888   888   888  d8(  888   888      888   888
+#  o888bood8P'  `Y8bod8P' o888o o888o `Y8bod8P' o888o o888o o888o o888o o888o `Y888""8o d888b     `V88V"V8P'
+
+
+def timings(func, args_list):
+    """call func for each args, return timings stats in ms"""
+
+    times = []
+    for args in args_list:
+        t = time.perf_counter()
+        func(*args)
+        times.append((time.perf_counter()-t)*1000)
+        continue
+
+    times.sort()
+    if (len(times)==0):
+        return {"calls":0}
+
+    return {
+        "calls":len(times),
+        "min":times[0],
+        "median":times[len(times)//2],
+        "max":times[-1],
+        "total":sum(times),
+        }
+
+
+def bench_tree(ng, rng, samples=200):
+
+    nodes = ng.nodes
+    context = get_fake_context(ng)
+    result = {"nodes":len(nodes), "links":len(ng.links)}
+
+    xs = [n.location.x for n in nodes]
+    ys = [n.location.y for n in nodes]
+    positions = [ (rng.uniform(min(xs),max(xs)), rng.uniform(min(ys),max(ys))) for _ in range(samples) ]
+    regular = [n for n in nodes if n.type not in {"FRAME","REROUTE","GROUP_OUTPUT"}]
+    frames = [n for n in nodes if (n.type=="FRAME")]
+
+    #picking
+    result["get_node_at_pos"] = timings(lambda p: noodler.get_node_at_pos(nodes, context, None, position=p,), [(p,) for p in positions])
+
+    #framing
+    result["get_nodes_in_frame_box"] = timings(lambda f: list(noodler.get_nodes_in_frame_box(f, nodes)), [(f,) for f in frames[:samples]])
+
+    #dependencies
+    starts = [ (rng.choice(regular),) for _ in range(min(samples,len(regular))) ]
+    result["get_dependecies_downstream"] = timings(lambda n: noodler.get_dependecies(n, context, mode="downstream"), starts)
+    result["get_dependecies_upstream"] = timings(lambda n: noodler.get_dependecies(n, context, mode="upstream", parent=True), starts)
+
+    #purge analysis, cold (links graph rebuilt) & warm
+    def purge_cold():
+        noodler.LinkGraphs.pop(ng.as_pointer(), None)
+        return noodler.purge_unused_nodes(ng, dry_run=True)
+    result["purge_unused_nodes_dry_run_cold"] = timings(purge_cold, [()]*5)
+    result["purge_unused_nodes_dry_run"] = timings(lambda: noodler.purge_unused_nodes(ng, dry_run=True), [()]*5)
+
+    #then the real removal on a copy. muted nodes & reroutes are left alone, 
+    #they are removed with the delete_reconnect operator which needs a node editor
+    purged = ng.copy()
+    result["purge_unused_nodes"] = timings(lambda: noodler.purge_unused_nodes(purged, delete_muted=False, delete_reroute=False), [()])
+    bpy.data.node_groups.remove(purged)
+
+    #search
+    noodle_scn = bpy.context.scene.noodler
+    noodle_scn["search_center"] = False #no editor to frame in background
+    def search(keywords):
+        noodle_scn["search_keywords"] = keywords #set without triggering the update, we call it ourselves
+        noodler.search_upd(noodle_scn, context)
+        return None
+    result["search_upd"] = timings(search, [("math",),("add",),("mix vector",),("mth",),("★",)]*4)
+
+    #chamfer setup, on a copy as it create nodes & links
+    chamfered = ng.copy()
+    holder = borrow(noodler.NOODLER_OT_chamfer, chamfered)
+    selected = [n for n in chamfered.nodes if (n.type=="REROUTE") and len(n.inputs[0].links) and len(n.outputs[0].links)]
+    noodler.get_frame_offsets(chamfered.nodes, refresh=True)
+    result["chamfer_directions"] = timings(lambda: [holder.chamfer_directions(n) for n in selected], [()])
+    result["chamfer_setup"] = timings(holder.setup_all, [()])
+    result["chamfer_move"] = timings(holder.move_all, [(d,) for d in range(0,100,5)])
+    bpy.data.node_groups.remove(chamfered)
+
+    #orthogonal routing, from an output port to an input port, short routes between neighbor layers & long routes across the tree
+    snap = noodler.get_tree_snapshot(nodes)
+    grid = noodler.get_node_grid(nodes)
+    idx = numpy.flatnonzero(~snap.is_frame & ~snap.is_reroute).tolist()
+    def get_route(a, b):
+        (ax, ay), (aw, _), (bx, by) = snap.absolute[a].tolist(), snap.dimensions[a].tolist(), snap.absolute[b].tolist()
+        return (ax+aw+20, ay-30), (bx-20, by-30)
+    routes = [ get_route(rng.choice(idx), rng.choice(idx)) for _ in range(samples*5) ]
+    near = [ (grid, s, e) for s,e in routes if (abs(e[0]-s[0])+abs(e[1]-s[1]) < 1000) ][:samples//10]
+    far = [ (grid, s, e) for s,e in routes if (abs(e[0]-s[0])+abs(e[1]-s[1]) > 5000) ][:samples//10]
+    result["find_orthogonal_path_short"] = timings(noodler.find_orthogonal_path, near)
+    result["find_orthogonal_path_long"] = timings(noodler.find_orthogonal_path, far)
+
+    #favorites
+    result["favorites_registry_rebuild"] = timings(lambda: noodler.get_favorites_registry(ng, rebuild=True), [()]*5)
+    favcount = len(noodler.get_favorites_registry(ng))
+    result["favorites_loop"] = timings(lambda i: noodler.get_favorites(nodes, i), [(i%max(favcount,1),) for i in range(samples)])
+
+    return result
+
+
+def main(argv):
+
+    parser = argparse.ArgumentParser(description="Noodler benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100,1000,10000,50000])
+    parser.add_argument("--kinds", nargs="+", default=list(TREE_KINDS.keys()), choices=list(TREE_KINDS.keys()))
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="noodler_bench.json")
+    args = parser.parse_args(argv)
+
+    report = {
+        "noodler":list(noodler.bl_info["version"]),
+        "blender":bpy.app.version_string,
+        "python":platform.python_version(),
+        "platform":platform.platform(),
+        "date":time.strftime("%Y-%m-%d %H:%M:%S"),
+        "results":[],
+        }
+
+    for kind in args.kinds:
+        for size in args.sizes:
+
+            rng = random.Random(args.seed)
+
+            t = time.perf_counter()
+            ng = build_tree(kind, size, seed=args.seed)
+            build_time = (time.perf_counter()-t)*1000
+
+            print(f"Noodler Bench: {kind} {size} nodes, built in {build_time:.0f}ms")
+            result = bench_tree(ng, rng, samples=args.samples)
+            result.update({"kind":kind, "size":size, "build_time":build_time})
+            report["results"].append(result)
+
+            bpy.data.node_groups.remove(ng)
+            continue
+        continue
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+
+    print(f"Noodler Bench: results written to {os.path.abspath(args.output)}")
+
+    return None
+
+
+if __name__ == "__main__":
+    main(sys.argv[sys.argv.index("--")+1:] if ("--" in sys.argv) else [])
@@ -0,0 +1,72 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+headless helpers shared by the tests & noodler_benchmark.py, running noodler functions & operators logic without a node editor
+"""
+
+import bpy
+from types import SimpleNamespace, FunctionType
+from mathutils import Vector
+
+
+def get_fake_context(ng):
+    """what the noodler functions read from an editor context, headless. the cursor is placed at the event region coordinates"""
+
+    space = SimpleNamespace(node_tree=ng, edit_tree=ng, cursor_location=Vector((0,0)))
+
+    def cursor_location_from_region(x, y):
+        space.cursor_location = Vector((x,y))
+        return None
+
+    space.cursor_location_from_region = cursor_location_from_region
+
+    return SimpleNamespace(
+        space_data=space,
+        region=SimpleNamespace(type="WINDOW", view2d=None),
+        area=SimpleNamespace(type="NODE_EDITOR", tag_redraw=lambda: None, as_pointer=lambda: 0),
+        active_node=ng.nodes.active,
+        scene=bpy.context.scene,
+        )
+
+
+def get_event(type="MOUSEMOVE", x=0, y=0, value="NOTHING"):
+
+    return SimpleNamespace(type=type, value=value, mouse_region_x=x, mouse_region_y=y, shift=False, ctrl=False, alt=False)
+
+
+def borrow(cls, ng=None):
+    """operators can't be instanced outside of blender ui, borrow their methods on a plain object"""
+
+    methods = {k:v for k,v in vars(cls).items() if isinstance(v, FunctionType) and (k!="__init__")}
+    holder = type(cls.__name__, (), methods)()
+    vars(cls)["__init__"](holder)
+    if (ng is not None):
+        holder.node_tree = ng
+
+    return holder
+
+
+def get_tree_state(ng):
+    """everything a modal tick could change"""
+
+    return (
+        [(n.name, n.location[:], n.select, n.parent.name if (n.parent is not None) else None) for n in ng.nodes],
+        [(l.from_node.name, l.from_socket.identifier, l.to_node.name, l.to_socket.identifier) for l in ng.links],
+        ng.nodes.active.name if (ng.nodes.active is not None) else None,
+        )
@@ -0,0 +1,246 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+deferred preview mode, modal ticks of draw_frame, draw_route & chamfer must not write the nodetree
+
+usage:
+    blender -b --factory-startup --python tests/test_deferred_preview.py
+
+writes are counted at the nodetree api: any attribute set on the tree, its nodes, links & sockets,
+and any new/remove/foreach_set call on its collections. nested writes (node.location.x = ..) can't be seen
+by the counter, the tree state is compared before & after the ticks as well.
+"""
+
+import os, sys, unittest
+from datetime import datetime, timedelta
+
+try:
+    import bpy
+    from mathutils import Vector
+except ImportError:
+    bpy = None
+
+if (bpy is not None):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import noodler
+    from headless import get_fake_context, get_event, borrow, get_tree_state
+
+
+class WriteCounter():
+
+    def __init__(self):
+        self.count = 0
+
+
+def get_wrapped_types():
+    """rna data we count writes on, everything else is returned as is"""
+
+    return (bpy.types.bpy_struct, bpy.types.bpy_prop_collection)
+
+
+def wrap(value, counter):
+
+    if isinstance(value, get_wrapped_types()):
+        return Counted(value, counter)
+
+    return value
+
+
+def unwrap(value):
+
+    if isinstance(value, Counted):
+        return object.__getattribute__(value, "_data")
+
+    return value
+
+
+class Counted():
+    """proxy of rna data counting every write made through it"""
+
+    WRITES = ("new", "remove", "clear", "foreach_set", "move")
+
+    def __init__(self, data, counter):
+        object.__setattr__(self, "_data", data)
+        object.__setattr__(self, "_counter", counter)
+
+    def __getattr__(self, name):
+
+        data, counter = object.__getattribute__(self, "_data"), object.__getattribute__(self, "_counter")
+        value = getattr(data, name)
+
+        if not callable(value):
+            return wrap(value, counter)
+
+        def call(*args, **kwargs):
+            if (name in Counted.WRITES):
+                counter.count += 1
+            return wrap(value(*[unwrap(a) for a in args], **{k:unwrap(v) for k,v in kwargs.items()}), counter)
+
+        return call
+
+    def __setattr__(self, name, value):
+
+        object.__getattribute__(self, "_counter").count += 1
+        setattr(object.__getattribute__(self, "_data"), name, unwrap(value))
+
+        return None
+
+    def __len__(self):
+        return len(unwrap(self))
+
+    def __iter__(self):
+        counter = object.__getattribute__(self, "_counter")
+        return (wrap(v, counter) for v in unwrap(self))
+
+    def __getitem__(self, key):
+        return wrap(unwrap(self)[key], object.__getattribute__(self, "_counter"))
+
+    def __contains__(self, value):
+        return unwrap(value) in unwrap(self)
+
+    def __bool__(self):
+        return True
+
+    def __eq__(self, other):
+        return unwrap(self)==unwrap(other)
+
+    def __hash__(self):
+        return hash(unwrap(self))
+
+
+@unittest.skipIf(bpy is None, "needs blender python")
+class DeferredPreviewTest(unittest.TestCase):
+
+    def setUp(self):
+
+        ng = self.node_tree = bpy.data.node_groups.new("NoodlerDeferredTest", "ShaderNodeTree")
+        self.counter = WriteCounter()
+        self.counted = Counted(ng, self.counter)
+
+        #math nodes chained through reroutes, a frame around the first ones
+        frame = ng.nodes.new("NodeFrame")
+        prev = None
+        for i in range(6):
+            n = ng.nodes.new("ShaderNodeMath")
+            n.location = (i*300, 0)
+            if (i<2):
+                n.parent = frame
+            if (prev is not None):
+                rr = ng.nodes.new("NodeReroute")
+                rr.location = (i*300-150, 100)
+                rr.select = True
+                ng.links.new(prev.outputs[0], rr.inputs[0])
+                ng.links.new(rr.outputs[0], n.inputs[0])
+            prev = n
+            continue
+
+        self.context = get_fake_context(ng)
+
+    def tearDown(self):
+
+        bpy.data.node_groups.remove(self.node_tree)
+        noodler.clear_tree_caches()
+
+    def run_ticks(self, op, events):
+        """reset the counter, run modal ticks, return writes count"""
+
+        self.counter.count = 0
+        for event in events:
+            self.assertEqual(op.modal(self.context, event), {'RUNNING_MODAL'})
+            continue
+
+        return self.counter.count
+
+    def get_moves(self):
+        return [get_event("MOUSEMOVE", x=x, y=x//2) for x in range(0,400,20)] + [get_event("TIMER", x=400, y=200)]
+
+    def test_counter(self):
+        """the counter must see writes, or zero proves nothing"""
+
+        n = self.counted.nodes.new("ShaderNodeMath")
+        n.location = (10,10)
+        self.counted.nodes.foreach_set("select", [False]*len(self.node_tree.nodes))
+
+        self.assertEqual(self.counter.count, 3)
+
+    def test_chamfer(self):
+
+        op = borrow(noodler.NOODLER_OT_chamfer)
+        op.node_tree = self.counted
+        op.init_click = Vector((0,0))
+
+        noodler.get_frame_offsets(self.node_tree.nodes, refresh=True)
+        for n in [n for n in op.node_tree.nodes if (n.type=="REROUTE")]:
+            op.chamfer_directions(n)
+
+        #deferred
+        op.preview = noodler.PreviewModel()
+        state = get_tree_state(self.node_tree)
+        self.assertEqual(self.run_ticks(op, self.get_moves()), 0)
+        self.assertEqual(get_tree_state(self.node_tree), state)
+        self.assertTrue(op.preview.lines)
+
+        #immediate, same ticks do write
+        op.preview = None
+        op.setup_all()
+        self.assertGreater(self.run_ticks(op, self.get_moves()), 0)
+
+    def test_draw_frame(self):
+
+        op = borrow(noodler.NOODLER_OT_draw_frame)
+        op.node_tree = self.counted
+        op.old = Vector((-100,200))
+        op.rect = (op.old.x, op.old.y, op.old.x, op.old.y)
+        op.init_time = datetime.now()-timedelta(seconds=1)
+
+        #deferred
+        op.preview = noodler.PreviewModel()
+        state = get_tree_state(self.node_tree)
+        self.assertEqual(self.run_ticks(op, self.get_moves()), 0)
+        self.assertEqual(get_tree_state(self.node_tree), state)
+        self.assertTrue(op.preview.rects)
+
+        #immediate, same ticks do write
+        op.preview = None
+        op.boxf = self.counted.nodes.new("NodeFrame")
+        self.assertGreater(self.run_ticks(op, self.get_moves()), 0)
+
+    def test_draw_route(self):
+
+        op = borrow(noodler.NOODLER_OT_draw_route)
+        op.node_tree = self.counted
+        op.init_click = Vector((0,0))
+        op.add_reroute(self.context, get_event(x=0, y=0))
+
+        #deferred
+        op.preview = noodler.PreviewModel()
+        state = get_tree_state(self.node_tree)
+        self.assertEqual(self.run_ticks(op, self.get_moves()), 0)
+        self.assertEqual(get_tree_state(self.node_tree), state)
+        self.assertTrue(op.preview.lines)
+
+        #immediate, same ticks do write
+        op.preview = None
+        self.assertGreater(self.run_ticks(op, self.get_moves()), 0)
+
+
+if __name__ == "__main__":
+    result = unittest.main(argv=[sys.argv[0]], exit=False).result
+    sys.exit(0 if result.wasSuccessful() else 1)
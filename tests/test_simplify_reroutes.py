@@ -0,0 +1,90 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+simplify reroutes, pass-through chains drawing a visible corner must survive
+
+usage:
+    blender -b --factory-startup --python tests/test_simplify_reroutes.py
+"""
+
+import os, sys, unittest
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+if (bpy is not None):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import noodler
+
+
+@unittest.skipIf(bpy is None, "needs blender python")
+class PassThroughTest(unittest.TestCase):
+
+    def setUp(self):
+
+        ng = self.node_tree = bpy.data.node_groups.new("NoodlerSimplifyTest", "ShaderNodeTree")
+        self.a = ng.nodes.new("ShaderNodeMath")
+        self.a.location = (-300, 0)
+        self.b = ng.nodes.new("ShaderNodeMath")
+        self.b.location = (600, 0)
+
+    def tearDown(self):
+
+        bpy.data.node_groups.remove(self.node_tree)
+        noodler.clear_tree_caches()
+
+    def add_chain(self, locations):
+        """link a to b through reroutes at the given locations"""
+
+        ng = self.node_tree
+        prev = self.a.outputs[0]
+        for loc in locations:
+            rr = ng.nodes.new("NodeReroute")
+            rr.location = loc
+            ng.links.new(prev, rr.inputs[0])
+            prev = rr.outputs[0]
+            continue
+        ng.links.new(prev, self.b.inputs[0])
+
+        return None
+
+    def simplify(self):
+        return noodler.simplify_reroutes(self.node_tree, collinear=False, zero_length=False, dangling=False, passthrough=True)
+
+    def test_offset_single_reroute(self):
+        """a single reroute has no y span, it still draws two corners if offset from both sockets"""
+
+        self.add_chain([(0,-500)])
+
+        self.assertEqual(self.simplify()["nodes_removed"], 0)
+        self.assertEqual(len([n for n in self.node_tree.nodes if (n.type=="REROUTE")]), 1)
+
+    def test_offset_flat_chain(self):
+
+        self.add_chain([(0,-500), (300,-500)])
+
+        self.assertEqual(self.simplify()["nodes_removed"], 0)
+        self.assertEqual(len([n for n in self.node_tree.nodes if (n.type=="REROUTE")]), 2)
+
+
+if __name__ == "__main__":
+    result = unittest.main(argv=[sys.argv[0]], exit=False).result
+    sys.exit(0 if result.wasSuccessful() else 1)